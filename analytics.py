@@ -0,0 +1,173 @@
+import re
+from datetime import date, timedelta
+
+import db
+
+BACKFILL_KEY = "analytics_backfilled"
+MAX_LIMIT = 100
+# Trailing-day windows for top buyers/sellers; each includes today.
+WINDOWS = {"1d": 1, "7d": 7, "30d": 30, "all": None}
+ROLES = ("buyer", "seller")
+
+# "WW II Tanks #3" is edition 3 of the "WW II Tanks" collection.
+EDITION_SUFFIX_RE = re.compile(r"\s*#\d+$")
+
+
+def collection_name(nft_name):
+    return EDITION_SUFFIX_RE.sub("", nft_name.strip()) or nft_name
+
+
+def record_sale(conn, nft_name, price_eth, buyer, seller, created_at):
+    """Folds one sale into the aggregates; call it in the transaction that writes the ledger row.
+
+    Everything the read side needs is updated here, so reads never scan the
+    ledger. The median comes from a per-collection price histogram, which costs
+    one pass over that collection's distinct prices per sale.
+    """
+    if price_eth is None:
+        return
+    collection = collection_name(nft_name)
+    conn.execute(
+        """INSERT INTO collection_prices (collection, price_eth, sale_count) VALUES (?, ?, 1)
+           ON CONFLICT(collection, price_eth) DO UPDATE SET sale_count = sale_count + 1""",
+        (collection, price_eth),
+    )
+    conn.execute(
+        """INSERT INTO collection_stats (collection, sale_count, volume_eth, floor_eth, median_eth,
+                                         last_price_eth, last_sale_at)
+           VALUES (?, 1, ?, ?, ?, ?, ?)
+           ON CONFLICT(collection) DO UPDATE SET
+               sale_count = sale_count + 1, volume_eth = volume_eth + excluded.volume_eth,
+               floor_eth = MIN(floor_eth, excluded.floor_eth),
+               last_price_eth = excluded.last_price_eth, last_sale_at = excluded.last_sale_at""",
+        (collection, price_eth, price_eth, price_eth, price_eth, created_at),
+    )
+    conn.execute("UPDATE collection_stats SET median_eth = ? WHERE collection = ?",
+                 (_median(conn, collection), collection))
+    new_collection = conn.execute(
+        "SELECT sale_count FROM collection_stats WHERE collection = ?", (collection,)
+    ).fetchone()[0] == 1
+    conn.execute(
+        """UPDATE market_totals SET sale_count = sale_count + 1, volume_eth = volume_eth + ?,
+                                    collections = collections + ? WHERE id = 1""",
+        (price_eth, int(new_collection)),
+    )
+    day = created_at[:10]
+    for role, party in (("buyer", buyer), ("seller", seller)):
+        conn.execute(
+            """INSERT INTO party_daily (day, role, party, sale_count, volume_eth) VALUES (?, ?, ?, 1, ?)
+               ON CONFLICT(day, role, party) DO UPDATE SET
+                   sale_count = sale_count + 1, volume_eth = volume_eth + excluded.volume_eth""",
+            (day, role, party, price_eth),
+        )
+        conn.execute(
+            """INSERT INTO party_totals (role, party, sale_count, volume_eth) VALUES (?, ?, 1, ?)
+               ON CONFLICT(role, party) DO UPDATE SET
+                   sale_count = sale_count + 1, volume_eth = volume_eth + excluded.volume_eth""",
+            (role, party, price_eth),
+        )
+
+
+def _median(conn, collection):
+    rows = conn.execute(
+        "SELECT price_eth, sale_count FROM collection_prices WHERE collection = ? ORDER BY price_eth", (collection,)
+    ).fetchall()
+    total = sum(row["sale_count"] for row in rows)
+    # Walk the cumulative counts to the middle sale (or the two middle sales).
+    lower_rank, upper_rank = (total + 1) // 2, total // 2 + 1
+    lower = upper = None
+    seen = 0
+    for row in rows:
+        seen += row["sale_count"]
+        if lower is None and seen >= lower_rank: lower = row["price_eth"]
+        if seen >= upper_rank:
+            upper = row["price_eth"]
+            break
+    return (lower + upper) / 2
+
+
+def backfill():
+    """Builds the aggregates from the existing ledger once, for databases that predate them."""
+    if db.get_meta(BACKFILL_KEY):
+        return 0
+    with db.transaction() as conn:
+        if conn.execute("SELECT 1 FROM meta WHERE key = ?", (BACKFILL_KEY,)).fetchone():
+            return 0
+        rows = conn.execute(
+            "SELECT nft_name, price_eth, buyer, seller, created_at FROM transactions WHERE kind = 'sale' ORDER BY id"
+        ).fetchall()
+        for row in rows:
+            record_sale(conn, row["nft_name"], row["price_eth"], row["buyer"], row["seller"], row["created_at"])
+        db.set_meta(BACKFILL_KEY, len(rows), conn=conn)
+    return len(rows)
+
+
+def _clamp_limit(limit):
+    try:
+        return max(1, min(int(limit), MAX_LIMIT))
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer.")
+
+
+def _eth(value):
+    # Summed REAL prices pick up float noise (0.6000000000000001); nine decimals is plenty.
+    return None if value is None else round(value, 9)
+
+
+def _collection_to_api(row):
+    return {
+        "collection": row["collection"], "sales": row["sale_count"], "volume": _eth(row["volume_eth"]),
+        "floorPrice": row["floor_eth"], "medianPrice": _eth(row["median_eth"]),
+        "lastPrice": row["last_price_eth"], "lastSaleAt": row["last_sale_at"],
+    }
+
+
+def market_summary(limit=10):
+    """Marketplace totals plus the `limit` collections with the highest volume.
+
+    Both reads are constant-time: the totals are one row kept by record_sale,
+    and the top collections come off the volume index.
+    """
+    limit = _clamp_limit(limit)
+    conn = db.get_connection()
+    totals = conn.execute(
+        "SELECT collections, sale_count AS sales, volume_eth AS volume FROM market_totals WHERE id = 1"
+    ).fetchone()
+    rows = conn.execute("SELECT * FROM collection_stats ORDER BY volume_eth DESC LIMIT ?", (limit,)).fetchall()
+    return {
+        "sales": totals["sales"], "volume": _eth(totals["volume"]), "collections": totals["collections"],
+        "topCollections": [_collection_to_api(row) for row in rows],
+    }
+
+
+def collection_stats(name):
+    row = db.get_connection().execute(
+        "SELECT * FROM collection_stats WHERE collection = ?", (collection_name(name),)
+    ).fetchone()
+    return _collection_to_api(row) if row else None
+
+
+def top_parties(role, window="7d", limit=10):
+    """Top buyers or sellers by volume over a trailing window of days.
+
+    A window of days sums that many days of party_daily; "all" reads the
+    all-time totals off their volume index, however long the history.
+    """
+    if role not in ROLES:
+        raise ValueError("role must be 'buyer' or 'seller'.")
+    if window not in WINDOWS:
+        raise ValueError(f"window must be one of {', '.join(WINDOWS)}.")
+    limit = _clamp_limit(limit)
+    if WINDOWS[window] is None:
+        rows = db.get_connection().execute(
+            """SELECT party, sale_count AS sales, volume_eth AS volume FROM party_totals
+               WHERE role = ? ORDER BY volume_eth DESC LIMIT ?""",
+            (role, limit),
+        ).fetchall()
+    else:
+        rows = db.get_connection().execute(
+            """SELECT party, SUM(sale_count) AS sales, SUM(volume_eth) AS volume FROM party_daily
+               WHERE role = ? AND day >= ? GROUP BY party ORDER BY volume DESC LIMIT ?""",
+            (role, (date.today() - timedelta(days=WINDOWS[window] - 1)).isoformat(), limit),
+        ).fetchall()
+    return [{"party": row["party"], "sales": row["sales"], "volume": _eth(row["volume"])} for row in rows]
@@ -1,12 +1,34 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, redirect, request, jsonify, send_file, url_for
 from flask_cors import CORS
 from dotenv import load_dotenv
+import csv
+import io
+import json
 import os
-import requests
-import base64
-from fpdf import FPDF
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
+from assets import AssetStore, asset_id_from_url
+import analytics
+import catalog
+import contracts
+import db
+from derivatives import SIZES as DERIVATIVE_SIZES, DerivativeStore
+import documents
+from frontend import FrontendAssets, build as build_frontend
+from group_commit import GroupCommitWriter
+from image_cache import ImageCache, SearchCache
+from images import AIImageService, StockImageService
+import ledger
+import metrics
+from profiling import RequestProfiler
+from receipt_queue import ReceiptQueue
+from singleflight import SingleFlight
+from upstream import UpstreamClient
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -16,6 +38,9 @@ CORS(app)
 # --- Configuration ---
 STABILITY_API_KEY = os.getenv("STABILITY_API_KEY")
 PEXELS_API_KEY = os.getenv("PEXELS_API_KEY")
+# Overridable so the upstream services can be replaced by local stubs.
+STABILITY_API_HOST = os.getenv("STABILITY_API_HOST", "https://api.stability.ai")
+PEXELS_API_HOST = os.getenv("PEXELS_API_HOST", "https://api.pexels.com")
 
 if not STABILITY_API_KEY:
     print("WARNING: STABILITY_API_KEY not found. 'Create NFT with AI' will not work.")
@@ -25,121 +50,647 @@ if not PEXELS_API_KEY:
 CONTRACTS_DIR = "contracts"
 TRANSACTIONS_DIR = "transactions"
 TRANSACTION_LOG_FILE = "transactions.log"
+DATABASE_FILE = "novamint.db"
+DB_SYNCHRONOUS = os.getenv("NOVAMINT_DB_SYNCHRONOUS", "full")
+GROUP_COMMIT = os.getenv("NOVAMINT_GROUP_COMMIT", "1") == "1"
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("NOVAMINT_GROUP_COMMIT_MAX_BATCH", "256"))
+GROUP_COMMIT_WAIT_MS = float(os.getenv("NOVAMINT_GROUP_COMMIT_WAIT_MS", "2"))
+BATCHES_DIR = "batches"
+PDF_WORKERS = int(os.getenv("NOVAMINT_PDF_WORKERS", "2"))
+BATCH_PDF_WORKERS = int(os.getenv("NOVAMINT_BATCH_PDF_WORKERS", "1"))
+MAX_BATCH_SIZE = 10000
+LISTING_MINUTES = float(os.getenv("NOVAMINT_LISTING_MINUTES", str(catalog.DEFAULT_LISTING_MINUTES)))
+# Free transfers trust the caller's claimed owner name, as purchases trust the buyer name; off unless enabled.
+TRANSFERS_ENABLED = os.getenv("NOVAMINT_TRANSFERS", "0") == "1"
+ASSETS_DIR = "assets"
+DERIVATIVES_DIR = os.path.join("cache", "derivatives")
+IMAGE_WORKERS = int(os.getenv("NOVAMINT_IMAGE_WORKERS", "2"))
+MAX_ASSET_MB = int(os.getenv("NOVAMINT_MAX_ASSET_MB", "20"))
+AI_IMAGE_CACHE_DIR = os.path.join("cache", "ai-images")
+AI_IMAGE_CACHE_MB = int(os.getenv("NOVAMINT_AI_CACHE_MB", "512"))
+AI_IMAGE_MEMORY_CACHE_MB = int(os.getenv("NOVAMINT_AI_MEMORY_CACHE_MB", "64"))
+PEXELS_CACHE_TTL = int(os.getenv("NOVAMINT_PEXELS_CACHE_TTL", "3600"))
+PEXELS_CACHE_ENTRIES = int(os.getenv("NOVAMINT_PEXELS_CACHE_ENTRIES", "2000"))
+PEXELS_PAGE_SIZE = int(os.getenv("NOVAMINT_PEXELS_PAGE_SIZE", "15"))
+PEXELS_QUOTA_RESERVE = int(os.getenv("NOVAMINT_PEXELS_QUOTA_RESERVE", "20"))
+FRONTEND_BUILD_DIR = os.getenv("NOVAMINT_FRONTEND_BUILD_DIR", os.path.join("build", "frontend"))
+PROFILES_DIR = os.getenv("NOVAMINT_PROFILES_DIR", "profiles")
+# Per-request profiling: open to every request when enabled, otherwise only with the admin token.
+PROFILING_ENABLED = os.getenv("NOVAMINT_PROFILING", "0") == "1"
+PROFILE_TOKEN = os.getenv("NOVAMINT_PROFILE_TOKEN")
+PROFILE_INTERVAL_MS = float(os.getenv("NOVAMINT_PROFILE_INTERVAL_MS", "1"))
 os.makedirs(CONTRACTS_DIR, exist_ok=True)
 os.makedirs(TRANSACTIONS_DIR, exist_ok=True)
+os.makedirs(BATCHES_DIR, exist_ok=True)
+
+db.init_db(DATABASE_FILE, synchronous=DB_SYNCHRONOUS)
+# Runs before the legacy import, which keeps the aggregates current by itself.
+analytics.backfill()
+imported = ledger.import_legacy_log(TRANSACTION_LOG_FILE)
+if imported:
+    print(f"Imported {imported} transaction(s) from {TRANSACTION_LOG_FILE} into {DATABASE_FILE}.")
+
+# FPDF is pure Python, so PDF layout runs in worker processes rather than threads.
+pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+# Batch jobs get their own pool, so a 10,000-document batch never queues ahead of buyers' receipts.
+batch_pool = ProcessPoolExecutor(max_workers=BATCH_PDF_WORKERS)
+receipt_queue = ReceiptQueue(TRANSACTIONS_DIR, pdf_pool,
+                             make_executor=lambda: ProcessPoolExecutor(max_workers=PDF_WORKERS))
+receipt_queue.recover()
+# Purchases from concurrent requests share one commit (and one fsync).
+ledger_writer = GroupCommitWriter(max_batch=GROUP_COMMIT_MAX_BATCH, max_wait=GROUP_COMMIT_WAIT_MS / 1000,
+                                  enabled=GROUP_COMMIT)
+asset_store = AssetStore(ASSETS_DIR)
+# Decoding and resampling are CPU-bound, so thumbnails get their own worker processes.
+image_pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+derivatives = DerivativeStore(DERIVATIVES_DIR, asset_store, image_pool)
+if not derivatives.enabled:
+    print("WARNING: Pillow not found. The activity feed will load full-size images.")
+# Fingerprinted, precompressed pages and stylesheet; rebuilt here only when a source changed.
+frontend_assets = FrontendAssets(FRONTEND_BUILD_DIR, build_frontend(FRONTEND_BUILD_DIR))
+profiler = RequestProfiler(PROFILES_DIR, enabled=PROFILING_ENABLED, token=PROFILE_TOKEN,
+                           interval=PROFILE_INTERVAL_MS / 1000)
+app.config['MAX_CONTENT_LENGTH'] = MAX_ASSET_MB * 1024 * 1024
+ai_image_cache = ImageCache(AI_IMAGE_CACHE_DIR, AI_IMAGE_CACHE_MB * 1024 * 1024, AI_IMAGE_MEMORY_CACHE_MB * 1024 * 1024)
+
+# Shared, pooled clients for the image upstreams. Text-to-image takes seconds,
+# so Stability gets a long read timeout; Pexels search should answer quickly.
+stability_client = UpstreamClient(
+    "Stability AI", STABILITY_API_HOST, read_timeout=90, retries=1,
+    headers={"Accept": "application/json", "Authorization": f"Bearer {STABILITY_API_KEY}"},
+)
+pexels_client = UpstreamClient("Pexels", PEXELS_API_HOST, read_timeout=10, retries=2, headers={"Authorization": PEXELS_API_KEY or ""})
+upstream_flights = SingleFlight()
+ai_images = AIImageService(STABILITY_API_KEY, stability_client, ai_image_cache, asset_store, upstream_flights,
+                           derivatives=derivatives)
+# Stale search results are kept for a day to ride out throttling and outages.
+pexels_search_cache = SearchCache(PEXELS_CACHE_ENTRIES, PEXELS_CACHE_TTL, max_age=24 * 3600)
+stock_images = StockImageService(PEXELS_API_KEY, pexels_client, pexels_search_cache, upstream_flights,
+                                 page_size=PEXELS_PAGE_SIZE, quota_reserve=PEXELS_QUOTA_RESERVE)
+
+
+def asset_url(asset_id):
+    return url_for('get_asset', asset_id=asset_id, _external=True)
+
+
+def with_derivatives(nft):
+    """Adds thumbnailUrl/mediumUrl to an NFT whose image lives in our asset store."""
+    asset_id = asset_id_from_url(nft["assetUrl"]) if nft else None
+    if asset_id and derivatives.enabled:
+        nft["thumbnailUrl"] = url_for('get_asset_derivative', asset_id=asset_id, size='thumb', _external=True)
+        nft["mediumUrl"] = url_for('get_asset_derivative', asset_id=asset_id, size='medium', _external=True)
+    return nft
+
+
+def collect_component_metrics():
+    """Scrape-time view of counters the caches, coalescer, breakers and ledger writer already keep."""
+    ai_cache, search_cache = ai_image_cache.stats(), pexels_search_cache.stats()
+    yield ("novamint_cache_hits_total", "counter", "Cache hits by cache and tier.", [
+        ({"cache": "ai_image", "tier": "memory"}, ai_cache["hits"]["memory"]),
+        ({"cache": "ai_image", "tier": "disk"}, ai_cache["hits"]["disk"]),
+        ({"cache": "pexels_search", "tier": "fresh"}, search_cache["hits"]),
+        ({"cache": "pexels_search", "tier": "stale"}, search_cache["staleHits"]),
+    ])
+    yield ("novamint_cache_misses_total", "counter", "Cache misses by cache.", [
+        ({"cache": "ai_image"}, ai_cache["misses"]), ({"cache": "pexels_search"}, search_cache["misses"]),
+    ])
+    yield ("novamint_cache_entries", "gauge", "Entries currently cached.", [
+        ({"cache": "ai_image"}, ai_cache["entries"]), ({"cache": "pexels_search"}, search_cache["entries"]),
+    ])
+    yield ("novamint_cache_bytes", "gauge", "Bytes held by the AI image cache, by tier.", [
+        ({"cache": "ai_image", "tier": "disk"}, ai_cache["bytes"]),
+        ({"cache": "ai_image", "tier": "memory"}, ai_cache["memoryBytes"]),
+    ])
+    yield ("novamint_upstream_calls_total", "counter", "Upstream calls started vs. coalesced into one in flight.", [
+        ({"upstream": upstream, "result": result}, count)
+        for upstream, counts in upstream_flights.stats().items() for result, count in counts.items()
+    ])
+    yield ("novamint_circuit_open", "gauge", "1 while an upstream's circuit breaker is open or probing.", [
+        ({"upstream": client.name}, int(client.breaker.state != "closed")) for client in (stability_client, pexels_client)
+    ])
+    writer = ledger_writer.stats()
+    yield ("novamint_ledger_commits_total", "counter", "Group commits of the ledger writer.", [({}, writer["batches"])])
+    yield ("novamint_ledger_writes_total", "counter", "Writes committed by the ledger writer.", [({}, writer["writes"])])
+
+metrics.registry.register_collector(collect_component_metrics)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def remember_response_status(response):
+    g.response_status = response.status_code
+    return response
+
+@app.teardown_request
+def record_request_metrics(error=None):
+    # Recorded at teardown, which runs even when an exception propagates past
+    # after_request (debug mode, PROPAGATE_EXCEPTIONS); such requests count as 500s.
+    if 'request_started' not in g:
+        return
+    status = 500 if error is not None else g.get('response_status', 500)
+    # The rule ("/api/nfts/<nft_id>"), not the path, keeps label cardinality bounded.
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.observe_request(route, request.method, status, time.perf_counter() - g.request_started)
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+# --- Frontend ---
+@app.route('/', methods=['GET'])
+def index_page():
+    return frontend_assets.serve('index.html')
+
+@app.route('/<page>.html', methods=['GET'])
+def frontend_page(page):
+    return frontend_assets.serve(f'{page}.html')
+
+@app.route('/assets/<path:path>', methods=['GET'])
+def frontend_asset(path):
+    return frontend_assets.serve(f'assets/{path}')
 
 
 # --- API Endpoints ---
 @app.route('/api/generate-ai-image', methods=['POST'])
 def generate_ai_image():
-    if not STABILITY_API_KEY:
-        return jsonify({"error": "AI service is not configured on the server."}), 500
-    data = request.get_json(); prompt = data.get('prompt')
-    if not prompt: return jsonify({"error": "Prompt is required"}), 400
-    try:
-        api_host = 'https://api.stability.ai'; engine_id = "stable-diffusion-v1-6"
-        response = requests.post(
-            f"{api_host}/v1/generation/{engine_id}/text-to-image",
-            headers={"Content-Type": "application/json", "Accept": "application/json", "Authorization": f"Bearer {STABILITY_API_KEY}"},
-            json={"text_prompts": [{"text": prompt}], "cfg_scale": 7, "height": 512, "width": 512, "samples": 1, "steps": 30}
-        )
-        response.raise_for_status(); response_data = response.json()
-        image_data_url = f"data:image/png;base64,{response_data['artifacts'][0]['base64']}"
-        return jsonify({"imageDataUrl": image_data_url})
-    except Exception as e:
-        print(f"AI Generation Error: {e}")
-        return jsonify({"error": f"Failed to generate AI image: {e}"}), 500
+    body, status, headers = ai_images.handle(request.get_json(), asset_url)
+    with metrics.stage("json_encode"):
+        response = jsonify(body)
+    return response, status, headers
+
+@app.route('/api/assets', methods=['POST'])
+def upload_asset():
+    upload = request.files.get('file')
+    if not upload: return jsonify({"error": "An image file is required."}), 400
+    try:
+        asset_id = asset_store.save(upload.read(), upload.mimetype)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 415
+    derivatives.submit(asset_id)
+    return jsonify({"assetId": asset_id, "assetUrl": asset_url(asset_id)}), 201
+
+@app.route('/api/assets/<asset_id>', methods=['GET'])
+def get_asset(asset_id):
+    if not asset_store.exists(asset_id): return jsonify({"error": "Unknown asset."}), 404
+    # Asset ids are content hashes, so the bytes behind a URL never change.
+    response = send_file(os.path.abspath(asset_store.path(asset_id)), mimetype=AssetStore.mimetype(asset_id),
+                         conditional=True, etag=asset_id.split('.')[0], max_age=31536000)
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/api/assets/<asset_id>/<size>.webp', methods=['GET'])
+def get_asset_derivative(asset_id, size):
+    if size not in DERIVATIVE_SIZES or not asset_store.exists(asset_id):
+        return jsonify({"error": "Unknown asset."}), 404
+    path = derivatives.get(asset_id, size)
+    if path is None:
+        # Pillow is missing or cannot read this image: fall back to the original.
+        return redirect(asset_url(asset_id))
+    response = send_file(os.path.abspath(path), mimetype="image/webp", conditional=True,
+                         etag=f"{asset_id.split('.')[0]}-{size}", max_age=31536000)
+    response.cache_control.immutable = True
+    return response
 
 @app.route('/api/generate-dashboard-image', methods=['POST'])
 def generate_dashboard_image():
-    if not PEXELS_API_KEY:
-        return jsonify({"error": "Image generation service is not configured."}), 500
-    data = request.get_json(); prompt = data.get('prompt')
-    if not prompt: return jsonify({"error": "A prompt is required."}), 400
-    try:
-        headers = {"Authorization": PEXELS_API_KEY}
-        url = f"https://api.pexels.com/v1/search?query={prompt}&per_page=1"
-        response = requests.get(url, headers=headers); response.raise_for_status()
-        pexels_data = response.json()
-        if not pexels_data.get("photos"): return jsonify({"error": "No images found for that prompt."}), 404
-        image_url = pexels_data["photos"][0]["src"]["medium"]
-        return jsonify({"imageUrl": image_url})
-    except Exception as e:
-        print(f"Pexels API Error: {e}")
-        return jsonify({"error": f"Failed to fetch image from Pexels."}), 500
+    body, status, headers = stock_images.handle(request.get_json())
+    with metrics.stage("json_encode"):
+        response = jsonify(body)
+    return response, status, headers
 
 
-class PDF(FPDF):
-    def header(self):
-        self.set_font('Arial', 'B', 12)
-        self.cell(0, 10, 'NovaMint Document', 0, 1, 'C')
-        self.ln(10)
-    def footer(self):
-        self.set_y(-15); self.set_font('Arial', 'I', 8); self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
+@app.route('/api/upstream-stats', methods=['GET'])
+def upstream_stats():
+    return jsonify({
+        "singleFlight": upstream_flights.stats(),
+        "aiImageCache": ai_image_cache.stats(),
+        "pexelsSearchCache": pexels_search_cache.stats(),
+        "circuitBreakers": {client.name: client.breaker.state for client in (stability_client, pexels_client)},
+    })
 
 @app.route('/api/save-contract', methods=['POST'])
+@profiler.profiled
 def save_contract():
     data = request.get_json(); filename = data.get('filename', 'contract.sol'); code = data.get('code', '')
     if not code: return jsonify({"error": "Contract code is required"}), 400
-    pdf_filename = filename.replace('.sol', '.pdf'); safe_filename = "".join([c for c in pdf_filename if c.isalpha() or c.isdigit() or c in ('.','_')]).rstrip()
+    safe_filename = documents.contract_filename(filename)
     filepath = os.path.join(CONTRACTS_DIR, safe_filename)
     try:
-        pdf = PDF(); pdf.add_page(); pdf.set_font("Courier", size=10); pdf.multi_cell(0, 5, txt=code)
-        pdf.output(filepath)
+        for stage, seconds in documents.render_contract(filepath, code).items():
+            metrics.observe_stage(stage, seconds)
         return jsonify({"message": f"Contract saved as {safe_filename} in the backend."})
     except Exception as e:
         print(f"PDF Generation Error: {e}")
         return jsonify({"error": "Failed to save contract as PDF."}), 500
 
 @app.route('/api/record-transaction', methods=['POST'])
+@profiler.profiled
 def record_transaction():
+    """Buys an NFT: {nftId, expectedVersion, buyerName, buyerEmail}.
+
+    The server owns ownership state. The transfer is a compare-and-swap against
+    the version the buyer saw, and it commits atomically with the ledger row and
+    the receipt job, so of several concurrent buyers exactly one succeeds and
+    the rest get 409 with the NFT's current state. Name, price and seller come
+    from the catalog, not the client.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict): return jsonify({"error": "JSON object required"}), 400
+    nft_id = data.get('nftId'); expected_version = data.get('expectedVersion')
+    # Identities may arrive split (buyerName/buyerEmail) or as one "Name (email)" string.
+    buyer_name, buyer_email = ((data.get('buyerName'), data.get('buyerEmail')) if data.get('buyerName')
+                               else ledger.split_party(data.get('buyerInfo') or ''))
+    if not nft_id or not buyer_name: return jsonify({"error": "nftId and buyerName are required."}), 400
+    # type() rather than isinstance(): JSON true/false arrive as bools, which are ints.
+    if type(expected_version) is not int: return jsonify({"error": "expectedVersion must be an integer."}), 400
+    buyer_info = ledger.format_party(buyer_name, buyer_email)
+    purchase_date = datetime.now().isoformat(timespec='seconds')
+    stamp = datetime.now().strftime('%Y%m%d%H%M%S')
+
+    def buy(conn):
+        nft = catalog.get_nft(nft_id, conn=conn)
+        if nft is None: return None
+        if nft['currentOwner'] == buyer_name: raise ValueError("You already own this NFT.")
+        catalog.transfer_nft(nft_id, buyer_name, expected_version=expected_version,
+                             listed_at=int(time.time() * 1000), conn=conn)
+        fields = {"item": nft['name'], "price": nft['price'], "seller": nft['currentOwner'], "buyer": buyer_info,
+                  "date": purchase_date.replace('T', ' ')}
+        transaction_id = ledger.append_transaction(nft['name'], nft['price'], buyer_info, nft['currentOwner'],
+                                                   purchase_date, nft_id=nft_id, conn=conn)
+        return (*receipt_queue.enqueue(conn, transaction_id, fields, stamp), fields)
+
+    try:
+        # The transfer, the ledger row and the receipt job commit together; rendering happens in the worker pool.
+        # A profiled purchase commits on the request thread, where the profiler can see it.
+        with metrics.stage("ledger_write"):
+            purchase = ledger_writer.run(buy, inline=profiler.active())
+    except catalog.TransferConflict as e:
+        return jsonify({"error": str(e), "nft": e.nft}), 409
+    except catalog.ListingExpired as e:
+        return jsonify({"error": str(e), "nft": e.nft}), 410
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Ledger Write Error: {e}")
+        return jsonify({"error": "Failed to record transaction."}), 500
+    if purchase is None: return jsonify({"error": "This NFT no longer exists."}), 404
+    receipt_id, safe_filename, fields = purchase
+    try:
+        receipt_queue.submit(receipt_id, safe_filename, fields)
+    except Exception as e:
+        # The purchase has committed; the job stays pending and is picked up when the receipt is polled.
+        print(f"Receipt Submit Error: {e}")
+    try:
+        ledger.write_audit_entry(fields['item'], fields['price'], buyer_info, fields['seller'], purchase_date)
+    except OSError as e:
+        print(f"Audit Log Write Error: {e}")
+    return jsonify({
+        "message": f"Transaction recorded; receipt {safe_filename} is being generated.",
+        "receiptId": receipt_id, "receiptUrl": f"/api/receipts/{receipt_id}",
+        "nft": with_derivatives(catalog.get_nft(nft_id)),
+    }), 202
+
+@app.route('/api/receipts/<receipt_id>', methods=['GET'])
+def get_receipt(receipt_id):
+    receipt = receipt_queue.get(receipt_id)
+    if not receipt: return jsonify({"error": "Unknown receipt."}), 404
+    try:
+        # Restarts a job that was never submitted or whose worker died; a no-op for one in flight.
+        receipt_queue.resume(receipt)
+    except Exception as e:
+        print(f"Receipt Submit Error: {e}")
+    body = {"receiptId": receipt["id"], "status": receipt["status"], "filename": receipt["filename"]}
+    if receipt["status"] == "done": body["downloadUrl"] = f"/api/receipts/{receipt_id}/download"
+    if receipt["status"] == "failed": body["error"] = "Failed to generate transaction receipt."
+    return jsonify(body)
+
+@app.route('/api/receipts/<receipt_id>/download', methods=['GET'])
+def download_receipt(receipt_id):
+    receipt = receipt_queue.get(receipt_id)
+    if not receipt: return jsonify({"error": "Unknown receipt."}), 404
+    if receipt["status"] != "done":
+        return jsonify({"error": f"Receipt is {receipt['status']}.", "status": receipt["status"]}), 409
+    return send_file(os.path.abspath(receipt_queue.path(receipt)), mimetype='application/pdf',
+                     as_attachment=True, download_name=receipt["filename"])
+
+def _batch_items(kind, raw_items, batch_id):
+    """Normalizes batch request items into the dicts the documents module renders."""
+    stamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    items = []
+    for i, raw in enumerate(raw_items, start=1):
+        if not isinstance(raw, dict): raise ValueError(f"Item {i} must be an object.")
+        if kind == "contract":
+            if not raw.get('code') or not isinstance(raw['code'], str): raise ValueError(f"Item {i} has no contract code.")
+            filename = raw.get('filename', f'contract_{i}.sol')
+            if not isinstance(filename, str): raise ValueError(f"Item {i} has an invalid filename.")
+            items.append({"filename": f"{i:05d}_{batch_id}_{documents.contract_filename(filename)}", "code": raw['code']})
+        else:
+            nft_name = raw.get('nftName', 'Unknown NFT')
+            if not isinstance(nft_name, str): raise ValueError(f"Item {i} has an invalid nftName.")
+            items.append({
+                "filename": f"{i:05d}_{documents.receipt_filename(nft_name, stamp, batch_id)}",
+                "item": nft_name, "price": raw.get('price', 0),
+                "seller": raw.get('sellerInfo', 'Unknown Seller'), "buyer": raw.get('buyerInfo', 'Unknown Buyer'),
+                "date": raw.get('date', datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+            })
+    return items
+
+def _render_chunks(kind, items, output_dir=None):
+    """Spreads `items` over the batch pool; returns one future per chunk (see documents.render_chunk)."""
+    # Several chunks per worker keeps the pool busy without per-document task overhead.
+    chunk_size = max(1, -(-len(items) // (BATCH_PDF_WORKERS * 4)))
+    return [batch_pool.submit(documents.render_chunk, kind, items[i:i + chunk_size], output_dir)
+            for i in range(0, len(items), chunk_size)]
+
+@app.route('/api/documents/batch', methods=['POST'])
+def batch_documents():
+    """Renders many receipts or contracts in one call.
+
+    Body: {"kind": "receipt" | "contract", "output": "files" | "pdf" | "zip", "items": [...]}.
+    Receipt items take the same fields as /api/record-transaction (plus an optional
+    "date"); contract items take the same fields as /api/save-contract.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict): return jsonify({"error": "Request body must be a JSON object."}), 400
+    kind = data.get('kind'); output = data.get('output', 'files'); raw_items = data.get('items') or []
+    if kind not in documents.PAGE_RENDERERS: return jsonify({"error": "kind must be 'receipt' or 'contract'."}), 400
+    if output not in ('files', 'pdf', 'zip'): return jsonify({"error": "output must be 'files', 'pdf' or 'zip'."}), 400
+    if not isinstance(raw_items, list) or not raw_items or len(raw_items) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"Provide between 1 and {MAX_BATCH_SIZE} items."}), 400
+    batch_id = uuid.uuid4().hex[:8]
+    try:
+        items = _batch_items(kind, raw_items, batch_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    batch_name = f"{kind}s_{datetime.now().strftime('%Y%m%d%H%M%S')}_{batch_id}"
+    try:
+        if output == 'pdf':
+            filepath = os.path.join(BATCHES_DIR, f"{batch_name}.pdf")
+            batch_pool.submit(documents.render_combined, filepath, kind, items).result()
+            return send_file(os.path.abspath(filepath), mimetype='application/pdf', as_attachment=True)
+        if output == 'zip':
+            filepath = os.path.join(BATCHES_DIR, f"{batch_name}.zip")
+            futures = _render_chunks(kind, items)
+            # PDF streams are already deflated, so the archive just stores them.
+            with zipfile.ZipFile(filepath, 'w', zipfile.ZIP_STORED) as zip_file:
+                for future in futures:
+                    for name, content in future.result():
+                        zip_file.writestr(name, content)
+            return send_file(os.path.abspath(filepath), mimetype='application/zip', as_attachment=True)
+        directory = CONTRACTS_DIR if kind == "contract" else TRANSACTIONS_DIR
+        futures = _render_chunks(kind, items, directory)
+        filenames = [name for future in futures for name in future.result()]
+        return jsonify({"message": f"Rendered {len(filenames)} {kind}(s).", "files": filenames})
+    except Exception as e:
+        print(f"Batch PDF Generation Error: {e}")
+        return jsonify({"error": "Failed to render documents."}), 500
+
+@app.route('/api/contracts', methods=['POST'])
+def generate_contract():
+    """Generates one collection's contract source: {kind, name, assetName, description, timestamp}."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict): return jsonify({"error": "Request body must be a JSON object."}), 400
+    kind = data.get('kind', 'upload')
+    try:
+        code = contracts.generate(kind, data.get('name'), data.get('assetName'), data.get('description'), data.get('timestamp'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"filename": contracts.filename(kind, data['name'].strip()), "code": code})
+
+@app.route('/api/contracts/batch', methods=['POST'])
+def batch_contracts():
+    """Generates contracts for many collections in one call and saves each as .sol source plus PDF.
+
+    Body: {"output": "files" | "zip", "collections": [{kind, name, assetName, description, timestamp}, ...]}.
+    Sources are generated here from the templates in contracts.py; the PDFs are
+    rendered on the shared worker pool like /api/documents/batch.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict): return jsonify({"error": "Request body must be a JSON object."}), 400
+    output = data.get('output', 'files'); specs = data.get('collections')
+    if output not in ('files', 'zip'): return jsonify({"error": "output must be 'files' or 'zip'."}), 400
+    if not isinstance(specs, list) or not specs or len(specs) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"Provide between 1 and {MAX_BATCH_SIZE} collections."}), 400
+    # Unique per batch, so concurrent batches never write to the same files.
+    batch_id = uuid.uuid4().hex[:8]
+    items = []
+    try:
+        for i, spec in enumerate(specs, start=1):
+            if not isinstance(spec, dict): raise ValueError("must be an object.")
+            kind = spec.get('kind', 'upload')
+            code = contracts.generate(kind, spec.get('name'), spec.get('assetName'), spec.get('description'), spec.get('timestamp'))
+            sol_filename = f"{i:05d}_{batch_id}_{contracts.filename(kind, spec['name'].strip())}"
+            items.append({"filename": documents.contract_filename(sol_filename), "source": sol_filename, "code": code})
+    except ValueError as e:
+        return jsonify({"error": f"Collection {i}: {e}"}), 400
+
+    try:
+        if output == 'zip':
+            filepath = os.path.join(BATCHES_DIR, f"contracts_{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}.zip")
+            futures = _render_chunks("contract", items)
+            with zipfile.ZipFile(filepath, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+                for item in items:
+                    zip_file.writestr(item["source"], item["code"])
+                for future in futures:
+                    for name, content in future.result():
+                        # PDF streams are already deflated.
+                        zip_file.writestr(name, content, compress_type=zipfile.ZIP_STORED)
+            return send_file(os.path.abspath(filepath), mimetype='application/zip', as_attachment=True)
+        futures = _render_chunks("contract", items, CONTRACTS_DIR)
+        for item in items:
+            # Written aside and renamed into place, so a reader never sees a half-written source.
+            path = os.path.join(CONTRACTS_DIR, item["source"]); tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(item["code"])
+            os.replace(tmp_path, path)
+        pdf_filenames = [name for future in futures for name in future.result()]
+        return jsonify({
+            "message": f"Saved {len(items)} contract(s) as .sol and PDF in the backend.",
+            "contracts": [{"source": item["source"], "pdf": pdf} for item, pdf in zip(items, pdf_filenames)],
+        })
+    except Exception as e:
+        print(f"Batch Contract Generation Error: {e}")
+        return jsonify({"error": "Failed to save contracts."}), 500
+
+@app.route('/api/nfts', methods=['POST'])
+def create_nft():
     data = request.get_json()
-    nft_name = data.get('nftName', 'Unknown NFT')
-    price = data.get('price', 0)
-    buyer_info = data.get('buyerInfo', 'Unknown Buyer')
-    seller_info = data.get('sellerInfo', 'Unknown Seller')
-    purchase_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    log_entry = f"Date: {purchase_date}, NFT: {nft_name}, Price: {price} ETH, Buyer: {buyer_info}, Seller: {seller_info}\\n"
-    with open(TRANSACTION_LOG_FILE, "a") as f:
-        f.write(log_entry)
-
-    receipt_content = (
-        f"--- NovaMint Transaction Receipt ---\\n\\n"
-        f"Item: {nft_name}\\n"
-        f"Price: {price} ETH\\n"
-        f"Seller: {seller_info}\\n"
-        f"Buyer: {buyer_info}\\n"
-        f"Date: {purchase_date}\\n\\n"
-        f"This document certifies the simulated purchase of the above NFT."
-    )
-    safe_filename = f"receipt_{nft_name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d%H%M%S')}.pdf"
-    filepath = os.path.join(TRANSACTIONS_DIR, safe_filename)
-    try:
-        pdf = PDF(orientation='P', unit='mm', format='A4'); pdf.add_page()
-        pdf.set_font("Arial", size=12); pdf.multi_cell(0, 10, txt=receipt_content)
-        pdf.output(filepath)
-        return jsonify({"message": f"Transaction recorded and receipt saved as {safe_filename}."})
+    name = (data.get('name') or '').strip(); owner = (data.get('owner') or '').strip()
+    if not name or not owner or data.get('price') is None:
+        return jsonify({"error": "name, price and owner are required."}), 400
+    try:
+        nft = catalog.create_nft(
+            name, data['price'], owner, nft_type=data.get('type', 'upload'), description=data.get('description'),
+            asset_url=data.get('assetUrl'), asset_name=data.get('assetName'), listing_minutes=LISTING_MINUTES,
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(with_derivatives(nft)), 201
+
+@app.route('/api/nfts/bulk', methods=['POST'])
+def bulk_mint():
+    """Mints `quantity` editions of one asset. Multipart form: file (or assetId), name, price, quantity, owner, description."""
+    form = request.form
+    name = (form.get('name') or '').strip(); owner = (form.get('owner') or '').strip()
+    if not name or not owner or not form.get('price'):
+        return jsonify({"error": "name, price and owner are required."}), 400
+    upload = request.files.get('file')
+    try:
+        if upload:
+            # Identical uploads hash to the same asset, so re-running a drop stores nothing new.
+            asset_id = asset_store.save(upload.read(), upload.mimetype); asset_name = upload.filename
+            derivatives.submit(asset_id)
+        elif asset_store.exists(form.get('assetId', '')):
+            asset_id = form['assetId']; asset_name = form.get('assetName')
+        else:
+            return jsonify({"error": "An image file or an existing assetId is required."}), 400
+        created = catalog.create_editions(
+            name, form['price'], owner, form.get('quantity', 1),
+            description=form.get('description'), asset_url=asset_url(asset_id), asset_name=asset_name,
+            listing_minutes=LISTING_MINUTES,
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"created": created, "assetId": asset_id, "assetUrl": asset_url(asset_id)}), 201
+
+@app.route('/api/nfts', methods=['GET'])
+def list_nfts():
+    args = request.args
+    try:
+        page, next_cursor = catalog.list_nfts(limit=args.get('limit', 24), cursor=args.get('cursor'), owner=args.get('owner'))
+    except ValueError:
+        return jsonify({"error": "limit and cursor must be numeric."}), 400
+    return jsonify({"nfts": [with_derivatives(nft) for nft in page], "nextCursor": next_cursor})
+
+@app.route('/api/nfts/<nft_id>', methods=['GET'])
+def get_nft(nft_id):
+    nft = catalog.get_nft(nft_id)
+    if not nft: return jsonify({"error": "This NFT no longer exists."}), 404
+    return jsonify(with_derivatives(nft))
+
+@app.route('/api/nfts/<nft_id>/transfer', methods=['POST'])
+def transfer_nft(nft_id):
+    """Gives an NFT away: {currentOwner, newOwner, expectedVersion}. Purchases go through /api/record-transaction.
+
+    The transfer applies only if the NFT is still at `expectedVersion` and
+    still belongs to `currentOwner`; otherwise it is a 409 with the NFT's state.
+    It commits with a zero-price "transfer" ledger row, which shows in the
+    history but not in the sales analytics.
+
+    There is no authentication: like a purchase's buyerName, `currentOwner` is
+    whatever the caller claims, and owner and version are public in every
+    listing. Anyone could therefore take any NFT, so the route is disabled
+    (403) unless NOVAMINT_TRANSFERS=1.
+    """
+    if not TRANSFERS_ENABLED: return jsonify({"error": "Transfers are disabled."}), 403
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict): return jsonify({"error": "Request body must be a JSON object."}), 400
+    current_owner = data.get('currentOwner'); new_owner = data.get('newOwner'); expected_version = data.get('expectedVersion')
+    if not isinstance(current_owner, str) or not current_owner.strip() or not isinstance(new_owner, str) or not new_owner.strip():
+        return jsonify({"error": "currentOwner and newOwner are required."}), 400
+    if type(expected_version) is not int: return jsonify({"error": "expectedVersion must be an integer."}), 400
+    current_owner, new_owner = current_owner.strip(), new_owner.strip()
+    transfer_date = datetime.now().isoformat(timespec='seconds')
+
+    def give(conn):
+        nft = catalog.transfer_nft(nft_id, new_owner, expected_version=expected_version,
+                                   expected_owner=current_owner, conn=conn)
+        if nft:
+            ledger.append_transaction(nft['name'], "0", new_owner, current_owner, transfer_date,
+                                      nft_id=nft_id, kind=ledger.TRANSFER, conn=conn)
+        return nft
+
+    try:
+        nft = ledger_writer.run(give)
+    except catalog.TransferConflict as e:
+        return jsonify({"error": str(e), "nft": e.nft}), 409
     except Exception as e:
-        print(f"Receipt Generation Error: {e}")
-        return jsonify({"error": "Failed to generate transaction receipt."}), 500
+        print(f"Ledger Write Error: {e}")
+        return jsonify({"error": "Failed to record transfer."}), 500
+    if not nft: return jsonify({"error": "This NFT no longer exists."}), 404
+    return jsonify(with_derivatives(nft))
 
 @app.route('/api/get-transactions', methods=['GET'])
+@profiler.profiled
 def get_transactions():
-    if not os.path.exists(TRANSACTION_LOG_FILE):
-        return jsonify([])
-    try:
-        with open(TRANSACTION_LOG_FILE, "r") as f:
-            lines = f.readlines()
-        transactions = []
-        for line in lines:
-            parts = {p.split(':')[0].strip(): ':'.join(p.split(':')[1:]).strip() for p in line.strip().split(', ')}
-            transactions.append(parts)
-        return jsonify(transactions)
+    args = request.args
+    try:
+        page, next_cursor = ledger.query_transactions(
+            limit=args.get('limit', 50), cursor=args.get('cursor'),
+            nft=args.get('nft'), buyer=args.get('buyer'), seller=args.get('seller'),
+            min_price=args.get('minPrice'), max_price=args.get('maxPrice'),
+            since=args.get('since'), until=args.get('until'),
+        )
+        with metrics.stage("json_encode"):
+            return jsonify({"transactions": page, "nextCursor": next_cursor})
+    except ValueError:
+        return jsonify({"error": "limit, cursor, minPrice and maxPrice must be numeric."}), 400
     except Exception as e:
-        print(f"Error reading transaction log: {e}")
+        print(f"Error reading transaction ledger: {e}")
         return jsonify({"error": "Could not retrieve transaction history."}), 500
 
+@app.route('/api/analytics', methods=['GET'])
+def get_analytics():
+    """Marketplace totals and top collections by volume, read from precomputed aggregates."""
+    try:
+        return jsonify(analytics.market_summary(limit=request.args.get('limit', 10)))
+    except ValueError:
+        return jsonify({"error": "limit must be numeric."}), 400
+
+@app.route('/api/analytics/collections/<path:name>', methods=['GET'])
+def get_collection_analytics(name):
+    stats = analytics.collection_stats(name)
+    if not stats: return jsonify({"error": "No sales recorded for this collection."}), 404
+    return jsonify(stats)
+
+@app.route('/api/analytics/top-parties', methods=['GET'])
+def get_top_parties():
+    """Top buyers or sellers (role=buyer|seller) by volume over window=1d|7d|30d|all."""
+    args = request.args
+    try:
+        parties = analytics.top_parties(args.get('role', 'buyer'), window=args.get('window', '7d'), limit=args.get('limit', 10))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"parties": parties})
+
+EXPORT_COLUMNS = ["id", "nftId", "Date", "NFT", "Price", "Buyer", "Seller", "priceWei",
+                  "buyerName", "buyerEmail", "sellerName", "sellerEmail", "kind"]
+
+def _export_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row) + "\n"
+
+def _export_csv(rows):
+    buffer = io.StringIO(); writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue(); buffer.seek(0); buffer.truncate()
+    yield buffer.getvalue()
+
+@app.route('/api/transactions/export', methods=['GET'])
+def export_transactions():
+    """Streams the ledger oldest first as NDJSON (default) or CSV.
+
+    `since` limits the export to purchases at or after a date(time); `afterId`
+    resumes after the last id a previous export returned.
+    """
+    export_format = request.args.get('format', 'ndjson'); after_id = request.args.get('afterId')
+    if export_format not in ('ndjson', 'csv'): return jsonify({"error": "format must be 'ndjson' or 'csv'."}), 400
+    if after_id is not None and not after_id.isdigit(): return jsonify({"error": "afterId must be numeric."}), 400
+    rows = ledger.iter_transactions(since=request.args.get('since'), after_id=after_id)
+    if export_format == 'csv':
+        body, mimetype = _export_csv(rows), 'text/csv'
+    else:
+        body, mimetype = _export_ndjson(rows), 'application/x-ndjson'
+    return Response(body, mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment; filename=transactions.{export_format}"})
+
 if __name__ == '__main__':
     print("Starting NovaMint backend server on http://127.0.0.1:5001")
     app.run(host='0.0.0.0', port=5001, debug=True)
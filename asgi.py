@@ -0,0 +1,131 @@
+"""ASGI entry point for running NovaMint in production.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5001
+    uvicorn --factory asgi:create_app --host 0.0.0.0 --port 5001
+
+The image endpoints spend nearly all their time waiting on Stability and
+Pexels, so they are served directly on the event loop with non-blocking HTTP
+clients and one process can keep hundreds of upstream calls in flight. Every
+other route is handed to the Flask app in `app.py`, which runs on a thread pool.
+"""
+import json
+import os
+import time
+
+from a2wsgi import WSGIMiddleware
+
+import app as backend
+import metrics
+
+WSGI_WORKERS = int(os.getenv("NOVAMINT_WSGI_WORKERS", "20"))
+# The native routes take a small JSON prompt; Flask's MAX_CONTENT_LENGTH does not cover them.
+MAX_BODY_BYTES = int(os.getenv("NOVAMINT_MAX_JSON_KB", "64")) * 1024
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+class NovaMintASGI:
+    def __init__(self, wsgi_workers=WSGI_WORKERS):
+        self.flask = WSGIMiddleware(backend.app, workers=wsgi_workers)
+        self.routes = {
+            "/api/generate-ai-image": self.generate_ai_image,
+            "/api/generate-dashboard-image": self.generate_dashboard_image,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        handler = self.routes.get(scope["path"]) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if handler is None:
+            return await self.flask(scope, receive, send)
+        started = time.perf_counter()
+        try:
+            data = json.loads(await _read_body(scope, receive) or b"null")
+        except BodyTooLarge:
+            status = 413
+            await _send_json(send, status, {"error": f"Request body exceeds {MAX_BODY_BYTES} bytes."})
+        except ValueError:
+            status = 400
+            await _send_json(send, status, {"error": "Request body must be JSON."})
+        else:
+            if isinstance(data, dict):
+                self._start_clients()
+                body, status, headers = await handler(scope, data)
+            else:
+                body, status, headers = {"error": "JSON object required"}, 400, None
+            await _send_json(send, status, body, headers)
+        metrics.observe_request(scope["path"], "POST", status, time.perf_counter() - started)
+
+    async def generate_ai_image(self, scope, data):
+        base_url = _base_url(scope)
+        return await backend.ai_images.ahandle(data, lambda asset_id: f"{base_url}/api/assets/{asset_id}")
+
+    async def generate_dashboard_image(self, scope, data):
+        return await backend.stock_images.ahandle(data)
+
+    def _start_clients(self):
+        # Async clients must be created inside the running event loop.
+        if backend.ai_images.async_client is None:
+            backend.ai_images.async_client = backend.stability_client.async_twin()
+        if backend.stock_images.async_client is None:
+            backend.stock_images.async_client = backend.pexels_client.async_twin()
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self._start_clients()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for service in (backend.ai_images, backend.stock_images):
+                    if service.async_client is not None:
+                        await service.async_client.aclose()
+                        service.async_client = None
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def create_app():
+    """App factory, e.g. `uvicorn --factory asgi:create_app`."""
+    return NovaMintASGI()
+
+
+async def _read_body(scope, receive, limit=MAX_BODY_BYTES):
+    """Reads the request body, raising BodyTooLarge as soon as it is known to exceed `limit` bytes."""
+    declared = dict(scope["headers"]).get(b"content-length", b"")
+    if declared.isdigit() and int(declared) > limit:
+        raise BodyTooLarge()
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > limit:
+            raise BodyTooLarge()
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def _send_json(send, status, body, headers=None):
+    with metrics.stage("json_encode"):
+        payload = json.dumps(body).encode("utf-8")
+    # Mirrors the Access-Control-Allow-Origin: * that flask_cors adds to Flask routes.
+    raw_headers = [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode()),
+                   (b"access-control-allow-origin", b"*")]
+    raw_headers += [(k.lower().encode("latin-1"), str(v).encode("latin-1")) for k, v in (headers or {}).items()]
+    await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+    await send({"type": "http.response.body", "body": payload})
+
+
+def _base_url(scope):
+    headers = dict(scope["headers"])
+    host = headers.get(b"host", b"").decode("latin-1")
+    if not host and scope.get("server"):
+        host = f"{scope['server'][0]}:{scope['server'][1]}"
+    return f"{scope['scheme']}://{host}{scope.get('root_path', '')}"
+
+
+app = create_app()
@@ -0,0 +1,54 @@
+import hashlib
+import os
+import re
+import threading
+
+# Content types accepted for NFT assets and the extension each is stored under.
+# SVG is deliberately absent: it can carry script and is served from our origin.
+CONTENT_TYPES = {"image/png": "png", "image/jpeg": "jpg", "image/gif": "gif", "image/webp": "webp"}
+MIMETYPES = {ext: content_type for content_type, ext in CONTENT_TYPES.items()}
+ASSET_ID_RE = re.compile(r"^[0-9a-f]{64}\.(png|jpg|gif|webp)$")
+ASSET_URL_RE = re.compile(r"/api/assets/([0-9a-f]{64}\.(?:png|jpg|gif|webp))$")
+
+
+def asset_id_from_url(url):
+    """Returns the asset id behind one of our asset URLs, or None for data URLs and third-party images."""
+    match = ASSET_URL_RE.search(url or "")
+    return match.group(1) if match else None
+
+
+class AssetStore:
+    """Content-addressed image store: each asset lives at <dir>/<hash[:2]>/<hash>.<ext>.
+
+    An asset id is "<sha256>.<ext>", so saving the same bytes twice is a no-op
+    and ids can be served with immutable caching.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def save(self, data, content_type):
+        """Stores `data` if it is not already present and returns its asset id."""
+        ext = CONTENT_TYPES.get(content_type)
+        if ext is None:
+            raise ValueError(f"Unsupported asset type: {content_type}")
+        asset_id = f"{hashlib.sha256(data).hexdigest()}.{ext}"
+        path = self.path(asset_id)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return asset_id
+
+    def path(self, asset_id):
+        return os.path.join(self.directory, asset_id[:2], asset_id)
+
+    def exists(self, asset_id):
+        return bool(ASSET_ID_RE.match(asset_id)) and os.path.exists(self.path(asset_id))
+
+    @staticmethod
+    def mimetype(asset_id):
+        return MIMETYPES[asset_id.rsplit(".", 1)[1]]
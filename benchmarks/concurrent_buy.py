@@ -0,0 +1,114 @@
+"""Load test for the purchase path: many buyers racing for one hot NFT.
+
+    python app.py &                                   # or: uvicorn asgi:app --port 5001
+    python benchmarks/concurrent_buy.py --buyers 300 --concurrency 100
+
+Two phases run against a freshly minted NFT:
+
+race     every buyer submits once with the same expectedVersion; exactly one
+         purchase may succeed, every other attempt must get 409.
+contend  every buyer retries on 409 (re-reading the version) until it has
+         bought the NFT once; the NFT must end at version == buyers and the
+         ledger must hold exactly one row per successful purchase.
+
+Exits non-zero if either invariant is violated.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+_local = threading.local()
+
+
+def session():
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+def mint(url, name):
+    response = session().post(f"{url}/api/nfts", json={"name": name, "price": "0.01", "owner": "benchmark-seller"})
+    response.raise_for_status()
+    return response.json()
+
+
+def buy(url, nft_id, version, buyer):
+    started = time.perf_counter()
+    response = session().post(f"{url}/api/record-transaction", json={
+        "nftId": nft_id, "expectedVersion": version, "buyerName": buyer, "buyerEmail": f"{buyer}@example.com",
+    })
+    return response.status_code, time.perf_counter() - started
+
+
+def ledger_rows(url, nft_id):
+    lines = session().get(f"{url}/api/transactions/export", params={"format": "ndjson"}).text.splitlines()
+    return sum(1 for line in lines if json.loads(line)["nftId"] == nft_id)
+
+
+def report(phase, statuses, latencies, elapsed):
+    counts = {code: statuses.count(code) for code in sorted(set(statuses))}
+    print(f"{phase:8} {len(statuses)} requests in {elapsed:.2f}s ({len(statuses) / elapsed:.0f} req/s); "
+          f"statuses {counts}; latency p50 {percentile(latencies, 50) * 1000:.1f}ms "
+          f"p95 {percentile(latencies, 95) * 1000:.1f}ms p99 {percentile(latencies, 99) * 1000:.1f}ms")
+
+
+def race(url, buyers, concurrency):
+    nft = mint(url, f"Race {uuid.uuid4().hex[:8]}")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(lambda i: buy(url, nft["id"], nft["version"], f"racer-{i}"), range(buyers)))
+    report("race", [s for s, _ in results], [l for _, l in results], time.perf_counter() - started)
+    wins = sum(1 for status, _ in results if status == 202)
+    conflicts = sum(1 for status, _ in results if status == 409)
+    return wins == 1 and conflicts == buyers - 1 and ledger_rows(url, nft["id"]) == 1
+
+
+def contend(url, buyers, concurrency, max_attempts):
+    nft = mint(url, f"Contend {uuid.uuid4().hex[:8]}")
+    statuses, latencies, lock = [], [], threading.Lock()
+
+    def until_bought(i):
+        for _ in range(max_attempts):
+            version = session().get(f"{url}/api/nfts/{nft['id']}").json()["version"]
+            status, latency = buy(url, nft["id"], version, f"buyer-{i}")
+            with lock:
+                statuses.append(status); latencies.append(latency)
+            if status == 202:
+                return True
+        return False
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        bought = sum(pool.map(until_bought, range(buyers)))
+    report("contend", statuses, latencies, time.perf_counter() - started)
+    final = session().get(f"{url}/api/nfts/{nft['id']}").json()
+    print(f"contend  {bought}/{buyers} buyers succeeded; final version {final['version']}")
+    return final["version"] == bought == statuses.count(202) and ledger_rows(url, nft["id"]) == bought
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:5001")
+    parser.add_argument("--buyers", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--max-attempts", type=int, default=1000)
+    args = parser.parse_args()
+    ok = race(args.url, args.buyers, args.concurrency)
+    ok = contend(args.url, args.buyers, args.concurrency, args.max_attempts) and ok
+    print("OK: no double sales" if ok else "FAILED: ownership invariant violated")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
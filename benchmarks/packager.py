@@ -0,0 +1,97 @@
+"""Wall time and archive size of the files.py packager on a synthetic project tree.
+
+    python benchmarks/packager.py                           # every format, 1 and N workers
+    python benchmarks/packager.py --files 5000 --formats deflate,zstd --workers 1,2,4,8
+
+The tree mixes source-like text (highly compressible) with hex-encoded random
+data (barely compressible) and is generated from a fixed seed, so runs are
+comparable. For each format and worker count the archive is built from
+scratch, then rebuilt after editing one file (the incremental path). Builds
+with different worker counts must be byte-identical; the script exits
+non-zero if they are not.
+"""
+import argparse
+import hashlib
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import files  # noqa: E402
+
+SOURCE_LINES = [
+    "def handle_{n}(request):",
+    "    data = request.get_json()",
+    "    if not data.get('prompt'): return jsonify({{'error': 'Prompt is required'}}), 400",
+    "    result = service_{n}.process(data, timeout={n})",
+    "    return jsonify(result), 200",
+    "",
+    "    .card-{n} {{ padding: 1rem; border-radius: 8px; color: var(--primary-text); }}",
+]
+
+
+def synthetic_tree(count, file_kb, seed=0):
+    rng = random.Random(seed)
+    tree = {}
+    for i in range(count):
+        if i % 5 == 4:
+            content = rng.randbytes(file_kb * 512).hex()
+        else:
+            lines = (SOURCE_LINES[j % len(SOURCE_LINES)].format(n=rng.randrange(1000)) for j in range(file_kb * 20))
+            content = "\n".join(lines)
+        tree[f"novamint-synthetic/module_{i // 100}/file_{i}.{'txt' if i % 5 == 4 else 'py'}"] = content
+    return tree
+
+
+def build(path, tree, compression, level, workers):
+    started = time.perf_counter()
+    files.create_project_zip(path, tree, compression, level, workers)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--file-kb", type=int, default=16, help="approximate size of each file")
+    parser.add_argument("--formats", default=",".join(files.COMPRESSION_METHODS))
+    parser.add_argument("--level", type=int)
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}")
+    args = parser.parse_args()
+
+    formats = [name for name in args.formats.split(",") if name]
+    if "zstd" in formats and files.zstandard is None:
+        print("Skipping zstd: the 'zstandard' package is not installed.")
+        formats.remove("zstd")
+    worker_counts = sorted({int(n) for n in args.workers.split(",")})
+    tree = synthetic_tree(args.files, args.file_kb)
+    raw_size = sum(len(content) for content in tree.values())
+    print(f"{len(tree)} files, {raw_size / 1e6:.1f} MB of input\n")
+    print(f"{'format':8} {'workers':>7} {'build s':>9} {'rebuild s':>10} {'size MB':>9} {'ratio':>6}  identical")
+
+    workdir = tempfile.mkdtemp(prefix="novamint-packager-")
+    identical = True
+    try:
+        for compression in formats:
+            digests = set()
+            for workers in worker_counts:
+                path = os.path.join(workdir, f"{compression}-{workers}.zip")
+                elapsed = build(path, tree, compression, args.level, workers)
+                with open(path, "rb") as f:
+                    digests.add(hashlib.sha256(f.read()).hexdigest())
+                size = os.path.getsize(path)
+                edited = dict(tree, **{next(iter(tree)): tree[next(iter(tree))] + "\n# edited"})
+                rebuild = build(path, edited, compression, args.level, workers)
+                print(f"{compression:8} {workers:>7} {elapsed:>9.2f} {rebuild:>10.2f} {size / 1e6:>9.2f} "
+                      f"{raw_size / size:>6.1f}  {'yes' if len(digests) == 1 else 'NO'}")
+            identical = identical and len(digests) == 1
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    sys.exit(0 if identical else 1)
+
+
+if __name__ == "__main__":
+    main()
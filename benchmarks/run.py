@@ -0,0 +1,306 @@
+"""Reproducible load and latency benchmarks for the NovaMint backend.
+
+    python benchmarks/run.py                                  # all scenarios, JSON saved to benchmarks/results/
+    python benchmarks/run.py --server asgi --concurrency 1,16,64
+    python benchmarks/run.py --compare benchmarks/results/<earlier run>.json
+
+Every run starts the backend in a fresh working directory (its own database,
+PDFs and caches) with Stability and Pexels replaced by local stubs
+(benchmarks/stubs.py), seeds the ledger to a known size, and drives each
+endpoint at each concurrency level, reporting throughput and p50/p95/p99
+latency. The scaling phase repeats the ledger-bound scenarios for each
+--history-sizes value. Results are saved as JSON; --compare prints the change
+against an earlier run and, with --fail-on-regression, exits non-zero when
+throughput or p95 latency moved by more than --tolerance.
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import catalog  # noqa: E402
+import db  # noqa: E402
+import ledger  # noqa: E402
+from stubs import UpstreamStub  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+SERVER_COMMANDS = {
+    "flask": [sys.executable, "-c", "import sys, app; app.app.run(host='127.0.0.1', port=int(sys.argv[1]), threaded=True)"],
+    "asgi": [sys.executable, "-m", "uvicorn", "asgi:app", "--host", "127.0.0.1", "--log-level", "warning", "--port"],
+}
+SAMPLE_CONTRACT = "// SPDX-License-Identifier: MIT\npragma solidity ^0.8.20;\n\ncontract Benchmark {\n" + \
+                  "".join(f"    uint256 public value{i} = {i};\n" for i in range(40)) + "}\n"
+PRICES = ["0.01", "0.05", "0.1", "0.13", "0.2", "0.25", "0.5", "1", "1.5", "2"]
+# Scenarios re-run for every ledger size in the scaling phase.
+HISTORY_SCENARIOS = ("record-transaction", "get-transactions", "get-transactions-filtered", "get-transactions-deep")
+
+
+class Target:
+    """The running backend plus the ids of seeded NFTs still available to buy."""
+
+    def __init__(self, url, nft_ids, history):
+        self.url = url
+        self.history = history
+        self._nft_ids = iter(nft_ids)
+        self._lock = threading.Lock()
+
+    def next_nft(self):
+        with self._lock:
+            return next(self._nft_ids)
+
+
+def _record_transaction(session, target, i):
+    return session.post(f"{target.url}/api/record-transaction", json={
+        "nftId": target.next_nft(), "expectedVersion": 0, "buyerName": f"Bench Buyer {i % 50}",
+        "buyerEmail": f"buyer{i % 50}@example.com",
+    })
+
+
+SCENARIOS = {
+    "record-transaction": _record_transaction,
+    "get-transactions": lambda session, target, i: session.get(f"{target.url}/api/get-transactions?limit=50"),
+    "get-transactions-filtered": lambda session, target, i: session.get(
+        f"{target.url}/api/get-transactions", params={"buyer": f"Seed Buyer {i % 100} ", "limit": 50}),
+    # A page from the middle of the history, as reached by following cursors.
+    "get-transactions-deep": lambda session, target, i: session.get(
+        f"{target.url}/api/get-transactions", params={"cursor": max(1, target.history // 2), "limit": 50}),
+    "save-contract": lambda session, target, i: session.post(
+        f"{target.url}/api/save-contract", json={"filename": f"bench_{i % 100}.sol", "code": SAMPLE_CONTRACT}),
+    # The same work from a collection spec: the source is generated server-side.
+    "contracts-batch": lambda session, target, i: session.post(f"{target.url}/api/contracts/batch", json={
+        "collections": [{"kind": "mint", "name": f"Bench Collection {i % 100}", "assetName": "bench.png"}]}),
+    "generate-ai-image": lambda session, target, i: session.post(
+        f"{target.url}/api/generate-ai-image", json={"prompt": f"benchmark scene {time.time_ns()} {i}"}),
+    "generate-ai-image-cached": lambda session, target, i: session.post(
+        f"{target.url}/api/generate-ai-image", json={"prompt": "benchmark cached scene"}),
+    "generate-dashboard-image": lambda session, target, i: session.post(
+        f"{target.url}/api/generate-dashboard-image", json={"prompt": f"benchmark photo {time.time_ns()} {i}"}),
+    "generate-dashboard-image-cached": lambda session, target, i: session.post(
+        f"{target.url}/api/generate-dashboard-image", json={"prompt": "benchmark cached photo"}),
+}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+def run_load(target, scenario, total, concurrency):
+    """Sends `total` requests for `scenario` from `concurrency` threads; returns summary stats."""
+    send = SCENARIOS[scenario]
+    counter, local = itertools.count(), threading.local()
+    latencies, errors, lock = [], [], threading.Lock()
+
+    def worker():
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        while (i := next(counter)) < total:
+            started = time.perf_counter()
+            try:
+                status = send(local.session, target, i).status_code
+            except Exception as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if not isinstance(status, int) or status >= 400:
+                    errors.append(status)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    duration = time.perf_counter() - started
+    return {
+        "requests": total, "concurrency": concurrency, "errors": len(errors),
+        "errorStatuses": sorted({str(status) for status in errors}),
+        "durationSeconds": round(duration, 3), "throughput": round(total / duration, 1),
+        **{f"p{pct}Ms": round(percentile(latencies, pct) * 1000, 2) for pct in (50, 95, 99)},
+    }
+
+
+def seed(workdir, history, nft_count):
+    """Writes `history` ledger rows and `nft_count` NFTs straight into the working directory's database."""
+    db.init_db(os.path.join(workdir, "novamint.db"))
+    with db.transaction() as conn:
+        for i in range(history):
+            ledger.append_transaction(
+                f"Seed Collection {i % 200} #{i}", PRICES[i % len(PRICES)], f"Seed Buyer {i % 100} (b{i % 100}@example.com)",
+                f"Seed Seller {i % 40}", f"2025-01-01T00:00:{i % 60:02d}", conn=conn,
+            )
+    for start in range(0, nft_count, catalog.MAX_EDITIONS):
+        catalog.create_editions("Bench Drop", "0.01", "Bench Seller", min(catalog.MAX_EDITIONS, nft_count - start))
+    ids = [row["id"] for row in db.get_connection().execute("SELECT id FROM nfts ORDER BY rowid")]
+    db.get_connection().close()
+    return ids
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def backend(server, history, nft_count, stub, keep=False):
+    """Seeds a fresh working directory, starts the backend in it and yields a Target."""
+    workdir = tempfile.mkdtemp(prefix="novamint-bench-")
+    nft_ids = seed(workdir, history, nft_count)
+    port = _free_port()
+    env = {
+        **os.environ, "PYTHONPATH": ROOT, "STABILITY_API_KEY": "benchmark", "PEXELS_API_KEY": "benchmark",
+        "STABILITY_API_HOST": stub.url, "PEXELS_API_HOST": stub.url,
+    }
+    log = open(os.path.join(workdir, "server.log"), "w")
+    process = subprocess.Popen(SERVER_COMMANDS[server] + [str(port)], cwd=workdir, env=env, stdout=log, stderr=log)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_ready(url, process)
+        yield Target(url, nft_ids, history)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        log.close()
+        if keep:
+            print(f"  working directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _wait_ready(url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("The backend exited during startup; see server.log (run with --keep).")
+        with contextlib.suppress(requests.ConnectionError):
+            if requests.get(f"{url}/api/nfts?limit=1", timeout=2).ok:
+                return
+        time.sleep(0.2)
+    raise RuntimeError("The backend did not start in time.")
+
+
+def run_scenarios(target, scenarios, levels, total, label=""):
+    results = {}
+    for scenario in scenarios:
+        for concurrency in levels:
+            stats = run_load(target, scenario, total, concurrency)
+            results.setdefault(scenario, []).append(stats)
+            print(f"  {label}{scenario:32} c={concurrency:<4} {stats['throughput']:>8.1f} req/s  "
+                  f"p50 {stats['p50Ms']:>8.2f}ms  p95 {stats['p95Ms']:>8.2f}ms  p99 {stats['p99Ms']:>8.2f}ms"
+                  f"  errors {stats['errors']}")
+    return results
+
+
+def compare(current, previous, tolerance):
+    """Prints throughput/p95 changes per scenario and concurrency; returns the regressions found."""
+    regressions = []
+
+    def rows(results):
+        flat = {}
+        for scenario, runs in results["scenarios"].items():
+            for stats in runs:
+                flat[(scenario, stats["concurrency"], results["baseHistory"])] = stats
+        for size, scenarios in results.get("scaling", {}).items():
+            for scenario, runs in scenarios.items():
+                for stats in runs:
+                    flat[(scenario, stats["concurrency"], int(size))] = stats
+        return flat
+
+    old, new = rows(previous), rows(current)
+    print(f"\nCompared with {previous['createdAt']} ({previous.get('commit') or 'unknown commit'}):")
+    for key in sorted(new.keys() & old.keys(), key=str):
+        before, after = old[key], new[key]
+        throughput = (after["throughput"] - before["throughput"]) / before["throughput"] if before["throughput"] else 0
+        p95 = (after["p95Ms"] - before["p95Ms"]) / before["p95Ms"] if before["p95Ms"] else 0
+        regressed = throughput < -tolerance or p95 > tolerance
+        if regressed:
+            regressions.append(key)
+        scenario, concurrency, history = key
+        print(f"  {scenario:32} c={concurrency:<4} history={history:<7} throughput {throughput:+7.1%}  "
+              f"p95 {p95:+7.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def _commit():
+    with contextlib.suppress(Exception):
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    return None
+
+
+def _int_list(value):
+    return [int(part) for part in value.split(",") if part]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", choices=sorted(SERVER_COMMANDS), default="flask")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of: %(default)s")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 16], help="comma-separated levels (default 1,16)")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and concurrency level")
+    parser.add_argument("--history", type=int, default=1000, help="ledger size for the main scenarios")
+    parser.add_argument("--history-sizes", type=_int_list, default=[1000, 10000, 100000],
+                        help="ledger sizes for the scaling phase; empty to skip")
+    parser.add_argument("--stability-latency-ms", type=float, default=100)
+    parser.add_argument("--pexels-latency-ms", type=float, default=30)
+    parser.add_argument("--output", help="where to save results (default benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="relative change counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--keep", action="store_true", help="keep the backend's working directories")
+    args = parser.parse_args()
+
+    scenarios = [name for name in args.scenarios.split(",") if name]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    stub = UpstreamStub(stability_latency=args.stability_latency_ms / 1000,
+                        pexels_latency=args.pexels_latency_ms / 1000).start()
+    purchases = args.requests * len(args.concurrency)
+    results = {
+        "createdAt": datetime.now().isoformat(timespec="seconds"), "commit": _commit(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "keep")},
+        "baseHistory": args.history, "scenarios": {}, "scaling": {},
+    }
+
+    print(f"Main scenarios ({args.server}, history {args.history}):")
+    with backend(args.server, args.history, purchases, stub, args.keep) as target:
+        results["scenarios"] = run_scenarios(target, scenarios, args.concurrency, args.requests)
+    results["upstreamCalls"] = dict(stub.calls)
+
+    history_scenarios = [name for name in scenarios if name in HISTORY_SCENARIOS]
+    for size in args.history_sizes if history_scenarios else []:
+        print(f"Scaling, history {size}:")
+        with backend(args.server, size, purchases, stub, args.keep) as target:
+            results["scaling"][str(size)] = run_scenarios(target, history_scenarios, args.concurrency, args.requests)
+    stub.shutdown()
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
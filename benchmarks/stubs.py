@@ -0,0 +1,83 @@
+"""Local stand-ins for the Stability and Pexels APIs, so benchmarks never touch the real services.
+
+    python benchmarks/stubs.py --port 5100     # STABILITY_API_HOST=PEXELS_API_HOST=http://127.0.0.1:5100
+
+Each call sleeps for a configurable latency to model the upstream's response
+time, then answers in the same shape as the real API.
+"""
+import argparse
+import base64
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Enough of a PNG signature for the asset store; the bytes vary with the prompt
+# so every prompt yields a distinct asset, like the real service.
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+class UpstreamStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, stability_latency=0.1, pexels_latency=0.03):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.stability_latency = stability_latency
+        self.pexels_latency = pexels_latency
+        self.calls = {"stability": 0, "pexels": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def count(self, upstream):
+        with self._lock:
+            self.calls[upstream] += 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        self.server.count("stability")
+        time.sleep(self.server.stability_latency)
+        prompt = body.get("text_prompts", [{}])[0].get("text", "")
+        image = PNG_SIGNATURE + prompt.encode("utf-8") * 64
+        self._send({"artifacts": [{"base64": base64.b64encode(image).decode("ascii"), "finishReason": "SUCCESS"}]})
+
+    def do_GET(self):
+        self.server.count("pexels")
+        time.sleep(self.server.pexels_latency)
+        photos = [{"id": i, "src": {"medium": f"https://images.example/{i}.jpeg"}} for i in range(15)]
+        self._send({"photos": photos}, {"X-Ratelimit-Remaining": "1000000",
+                                        "X-Ratelimit-Reset": str(int(time.time()) + 3600)})
+
+    def _send(self, body, headers=None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve stub Stability/Pexels APIs.")
+    parser.add_argument("--port", type=int, default=5100)
+    parser.add_argument("--stability-latency-ms", type=float, default=100)
+    parser.add_argument("--pexels-latency-ms", type=float, default=30)
+    args = parser.parse_args()
+    stub = UpstreamStub(args.port, args.stability_latency_ms / 1000, args.pexels_latency_ms / 1000)
+    print(f"Stub upstreams on {stub.url}")
+    stub.serve_forever()
@@ -0,0 +1,145 @@
+import time
+import uuid
+
+import db
+
+MAX_PAGE_SIZE = 200
+MAX_EDITIONS = 10000
+NFT_TYPES = ("mint", "upload")
+# How long a new listing can be bought for.
+DEFAULT_LISTING_MINUTES = 5
+INSERT_NFT_SQL = """INSERT INTO nfts (id, type, name, description, price, asset_url, asset_name,
+                                      original_owner, current_owner, created_at, expires_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+
+class TransferConflict(Exception):
+    """Raised when an NFT changed owner since the caller read it; `nft` is its current state."""
+
+    def __init__(self, nft):
+        super().__init__("This NFT was sold to someone else first.")
+        self.nft = nft
+
+
+class ListingExpired(Exception):
+    """Raised when an NFT is bought after its listing expired; `nft` is its current state."""
+
+    def __init__(self, nft):
+        super().__init__("This listing has expired.")
+        self.nft = nft
+
+
+def to_api(row):
+    """Formats a catalog row with the field names the frontend pages use."""
+    return {
+        "id": row["id"], "type": row["type"], "name": row["name"], "description": row["description"],
+        "price": row["price"], "assetUrl": row["asset_url"], "assetName": row["asset_name"],
+        "originalOwner": row["original_owner"], "currentOwner": row["current_owner"],
+        "timestamp": row["created_at"], "expiresAt": row["expires_at"], "version": row["version"],
+    }
+
+
+def create_nft(name, price, owner, nft_type="upload", description=None, asset_url=None, asset_name=None,
+               listing_minutes=DEFAULT_LISTING_MINUTES, conn=None):
+    """Adds one NFT to the catalog, listed for `listing_minutes`, and returns it in API form."""
+    if nft_type not in NFT_TYPES:
+        raise ValueError(f"type must be one of {', '.join(NFT_TYPES)}.")
+    nft_id = _new_id()
+    created_at = int(time.time() * 1000)
+    (conn or db.get_connection()).execute(
+        INSERT_NFT_SQL,
+        (nft_id, nft_type, name, description, _format_price(price), asset_url, asset_name,
+         owner, owner, created_at, created_at + int(listing_minutes * 60000)),
+    )
+    return get_nft(nft_id, conn=conn)
+
+
+def create_editions(name, price, owner, quantity, description=None, asset_url=None, asset_name=None,
+                    listing_minutes=DEFAULT_LISTING_MINUTES):
+    """Mints editions "<name> #1" .. "#<quantity>" sharing one asset, in a single transaction.
+
+    Rows are generated lazily and reference the asset by URL, so a large drop
+    costs one small row per edition rather than a copy of the image.
+    """
+    quantity = _parse_quantity(quantity)
+    price = _format_price(price)
+    created_at = int(time.time() * 1000)
+    expires_at = created_at + int(listing_minutes * 60000)
+    rows = (
+        (_new_id(), "mint", f"{name} #{i}", description, price, asset_url, asset_name, owner, owner,
+         created_at, expires_at)
+        for i in range(1, quantity + 1)
+    )
+    with db.transaction() as conn:
+        conn.executemany(INSERT_NFT_SQL, rows)
+    return quantity
+
+
+def _new_id():
+    return f"nft-{uuid.uuid4().hex}"
+
+
+def _parse_quantity(quantity):
+    try:
+        quantity = int(quantity)
+    except (TypeError, ValueError):
+        quantity = None
+    if quantity is None or not 1 <= quantity <= MAX_EDITIONS:
+        raise ValueError(f"quantity must be an integer between 1 and {MAX_EDITIONS}.")
+    return quantity
+
+
+def _format_price(price):
+    try:
+        return f"{float(price):.2f}"
+    except (TypeError, ValueError):
+        raise ValueError("price must be a number.")
+
+
+def get_nft(nft_id, conn=None):
+    row = (conn or db.get_connection()).execute("SELECT * FROM nfts WHERE id = ?", (nft_id,)).fetchone()
+    return to_api(row) if row else None
+
+
+def list_nfts(limit=24, cursor=None, owner=None):
+    """Returns one newest-first page of NFTs and the cursor for the next page."""
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    clauses, params = [], []
+    if cursor is not None:
+        clauses.append("rowid < ?"); params.append(int(cursor))
+    if owner:
+        clauses.append("current_owner = ?"); params.append(owner)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = db.get_connection().execute(
+        f"SELECT rowid, * FROM nfts {where} ORDER BY rowid DESC LIMIT ?", params + [limit + 1]
+    ).fetchall()
+    next_cursor = rows[limit - 1]["rowid"] if len(rows) > limit else None
+    return [to_api(row) for row in rows[:limit]], next_cursor
+
+
+def transfer_nft(nft_id, new_owner, expected_version=None, expected_owner=None, listed_at=None, conn=None):
+    """Moves an NFT to `new_owner` as a compare-and-swap; returns the updated NFT, or None if it does not exist.
+
+    The update only applies if the NFT is still at `expected_version` (and
+    owned by `expected_owner`) when given; otherwise TransferConflict is raised.
+    Purchases pass `listed_at` (ms since the epoch) so a listing that expired
+    by then raises ListingExpired instead. Either way the version is bumped, so
+    every transfer invalidates older reads.
+    """
+    conn = conn or db.get_connection()
+    clauses, params = ["id = ?"], [nft_id]
+    if expected_version is not None:
+        clauses.append("version = ?"); params.append(int(expected_version))
+    if expected_owner is not None:
+        clauses.append("current_owner = ?"); params.append(expected_owner)
+    if listed_at is not None:
+        clauses.append("(expires_at IS NULL OR expires_at > ?)"); params.append(int(listed_at))
+    cursor = conn.execute(
+        f"UPDATE nfts SET current_owner = ?, version = version + 1 WHERE {' AND '.join(clauses)}", [new_owner] + params
+    )
+    nft = get_nft(nft_id, conn=conn)
+    if nft is not None and not cursor.rowcount:
+        if listed_at is not None and nft["expiresAt"] is not None and nft["expiresAt"] <= listed_at:
+            raise ListingExpired(nft)
+        raise TransferConflict(nft)
+    return nft
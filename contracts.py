@@ -0,0 +1,149 @@
+"""ERC721 contract sources for NFT collections (see /api/contracts in app.py).
+
+The templates are assembled and parsed once at import; generating a contract
+is a single `substitute()` over a handful of escaped parameters, so batches of
+thousands of collections cost little more than the PDF rendering that follows.
+"""
+import math
+import re
+import time
+from string import Template
+
+KINDS = ("mint", "upload")
+
+_HEADER = """\
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.20;
+import "@openzeppelin/contracts/token/ERC721/ERC721.sol";
+import "@openzeppelin/contracts/token/ERC721/extensions/ERC721URIStorage.sol";
+import "@openzeppelin/contracts/access/Ownable.sol";
+import "@openzeppelin/contracts/utils/Counters.sol";
+
+contract $contract is ERC721, ERC721URIStorage, Ownable {
+    using Counters for Counters.Counter;
+    Counters.Counter private _tokenIdCounter;
+"""
+
+_CONSTRUCTOR = """\
+    uint256 public constant creationTimestamp = $timestamp;
+
+    constructor(address initialOwner)
+        ERC721($name, $symbol) Ownable(initialOwner) {}
+
+"""
+
+_OVERRIDES = """\
+    function _update(address to, uint256 tokenId, address auth) internal override(ERC721, ERC721URIStorage) returns (address) { return super._update(to, tokenId, auth); }
+    function _increaseBalance(address account, uint128 amount) internal override(ERC721, ERC721URIStorage) { super._increaseBalance(account, amount); }
+    function tokenURI(uint256 tokenId) public view override(ERC721, ERC721URIStorage) returns (string memory) { return super.tokenURI(tokenId); }
+    function supportsInterface(bytes4 interfaceId) public view override(ERC721, ERC721URIStorage) returns (bool) { return super.supportsInterface(interfaceId); }
+    function _burn(uint256 tokenId) internal override(ERC721, ERC721URIStorage) { super._burn(tokenId); }
+}
+"""
+
+TEMPLATES = {
+    # A minted collection: editions sharing one asset, minted by the owner.
+    "mint": Template(_HEADER + """\
+    string public constant collectionName = $name;
+$description    string public constant defaultAssetName = $asset_name;
+""" + _CONSTRUCTOR + """\
+    function mintNFT(address recipient, string memory tokenURI) public onlyOwner returns (uint256) {
+        _tokenIdCounter.increment();
+        uint256 newItemId = _tokenIdCounter.current();
+        _safeMint(recipient, newItemId);
+        _setTokenURI(newItemId, tokenURI);
+        return newItemId;
+    }
+""" + _OVERRIDES),
+    # A single uploaded artwork.
+    "upload": Template(_HEADER + """\
+    string public constant nftCollectionName = $name;
+    string public constant nftImageReference = $asset_name;
+""" + _CONSTRUCTOR + """\
+    function safeMint(address to, string memory uri) public onlyOwner returns (uint256) {
+        _tokenIdCounter.increment();
+        uint256 newItemId = _tokenIdCounter.current();
+        _safeMint(to, newItemId);
+        _setTokenURI(newItemId, uri);
+        return newItemId;
+    }
+""" + _OVERRIDES),
+}
+DEFAULT_CONTRACT_NAMES = {"mint": "MyNFTCollection", "upload": "MyNFT"}
+FILENAME_SUFFIXES = {"mint": "Collection", "upload": "Contract"}
+_IDENTIFIER_RE = re.compile(r"[^a-zA-Z0-9_]")
+_FILENAME_RE = re.compile(r"[^a-zA-Z0-9]")
+
+
+def contract_name(kind, name):
+    """The Solidity identifier for a collection: its name with everything but [A-Za-z0-9_] dropped."""
+    identifier = _IDENTIFIER_RE.sub("", name) or DEFAULT_CONTRACT_NAMES[kind]
+    return f"_{identifier}" if identifier[0].isdigit() else identifier
+
+
+def filename(kind, name):
+    """The .sol filename the pages have always used, e.g. "Beach_sunset_Collection.sol"."""
+    return f"{_FILENAME_RE.sub('_', name) or 'NFT'}_{FILENAME_SUFFIXES[kind]}.sol"
+
+
+def generate(kind, name, asset_name="", description=None, timestamp=None):
+    """Returns the contract source for one collection.
+
+    `timestamp` (UNIX seconds) defaults to now; pass the same value to get
+    byte-identical output for the same collection. Parameters usually come
+    straight from request JSON, so anything of the wrong type or out of range
+    raises ValueError.
+    """
+    if not isinstance(kind, str) or kind not in TEMPLATES:
+        raise ValueError(f"kind must be one of {', '.join(KINDS)}.")
+    if name is not None and not isinstance(name, str):
+        raise ValueError("name must be a string.")
+    name = (name or "").strip()
+    if not name:
+        raise ValueError("name is required.")
+    for field, value in (("assetName", asset_name), ("description", description)):
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"{field} must be a string.")
+    timestamp = _timestamp(timestamp)
+    contract = contract_name(kind, name)
+    return TEMPLATES[kind].substitute(
+        contract=contract, name=_string_literal(name), symbol=_string_literal(contract.lstrip("_")[:4].upper()),
+        asset_name=_string_literal(asset_name or ""), description=_description_comment(description),
+        timestamp=timestamp,
+    )
+
+
+def _timestamp(value):
+    # A uint256 in the contract: a finite, non-negative number of seconds (bools are not numbers here).
+    if value is None:
+        return int(time.time())
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            raise ValueError("timestamp must be a number.")
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError("timestamp must be a number.")
+    if isinstance(value, float) and not math.isfinite(value) or not 0 <= value < 2 ** 256:
+        raise ValueError("timestamp must be a finite, non-negative number.")
+    return int(value)
+
+
+def _string_literal(value):
+    """Quotes `value` as a Solidity string literal; non-ASCII characters become \\x escapes of their UTF-8 bytes."""
+    parts = []
+    for char in value:
+        if char in '"\\':
+            parts.append("\\" + char)
+        elif " " <= char <= "~":
+            parts.append(char)
+        else:
+            parts.extend(f"\\x{byte:02x}" for byte in char.encode("utf-8"))
+    return '"' + "".join(parts) + '"'
+
+
+def _description_comment(description):
+    if not description or not description.strip():
+        return ""
+    lines = description.strip().splitlines()
+    return "    // Description: " + "\n//              ".join(lines) + "\n"
@@ -0,0 +1,236 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# What Python's str.strip() removes, for migrations that mirror it in SQL.
+_WHITESPACE = "' ' || char(9, 10, 11, 12, 13)"
+
+# Each migration is a tuple of SQL statements that moves the schema up one
+# version. PRAGMA user_version records how many have been applied, so new
+# migrations must only ever be appended to this list.
+MIGRATIONS = [
+    (
+        """CREATE TABLE transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TEXT NOT NULL,
+            nft_name TEXT NOT NULL,
+            price TEXT NOT NULL,
+            buyer TEXT NOT NULL,
+            seller TEXT NOT NULL
+        )""",
+        "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+    ),
+    (
+        # Numeric price column and indexes backing /api/get-transactions filters.
+        "ALTER TABLE transactions ADD COLUMN price_eth REAL",
+        "UPDATE transactions SET price_eth = CAST(price AS REAL)",
+        "CREATE INDEX idx_transactions_nft ON transactions (nft_name, id)",
+        "CREATE INDEX idx_transactions_buyer ON transactions (buyer, id)",
+        "CREATE INDEX idx_transactions_seller ON transactions (seller, id)",
+        "CREATE INDEX idx_transactions_price ON transactions (price_eth, id)",
+        "CREATE INDEX idx_transactions_created ON transactions (created_at, id)",
+    ),
+    (
+        # Durable job queue for receipt PDFs rendered off the request thread.
+        """CREATE TABLE receipts (
+            id TEXT PRIMARY KEY,
+            transaction_id INTEGER NOT NULL REFERENCES transactions (id),
+            filename TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            error TEXT,
+            created_at TEXT NOT NULL,
+            finished_at TEXT
+        )""",
+        "CREATE INDEX idx_receipts_pending ON receipts (status) WHERE status = 'pending'",
+    ),
+    (
+        # Marketplace catalog; pages are keyed on the implicit rowid (newest last).
+        """CREATE TABLE nfts (
+            id TEXT PRIMARY KEY,
+            type TEXT NOT NULL,
+            name TEXT NOT NULL,
+            description TEXT,
+            price TEXT NOT NULL,
+            asset_url TEXT,
+            asset_name TEXT,
+            original_owner TEXT NOT NULL,
+            current_owner TEXT NOT NULL,
+            created_at INTEGER NOT NULL
+        )""",
+        "CREATE INDEX idx_nfts_owner ON nfts (current_owner)",
+    ),
+    (
+        # Sales aggregates maintained by analytics.record_sale on every purchase.
+        """CREATE TABLE collection_stats (
+            collection TEXT PRIMARY KEY,
+            sale_count INTEGER NOT NULL,
+            volume_eth REAL NOT NULL,
+            floor_eth REAL NOT NULL,
+            median_eth REAL NOT NULL,
+            last_price_eth REAL NOT NULL,
+            last_sale_at TEXT NOT NULL
+        )""",
+        "CREATE INDEX idx_collection_stats_volume ON collection_stats (volume_eth)",
+        """CREATE TABLE collection_prices (
+            collection TEXT NOT NULL,
+            price_eth REAL NOT NULL,
+            sale_count INTEGER NOT NULL,
+            PRIMARY KEY (collection, price_eth)
+        )""",
+        """CREATE TABLE party_daily (
+            day TEXT NOT NULL,
+            role TEXT NOT NULL,
+            party TEXT NOT NULL,
+            sale_count INTEGER NOT NULL,
+            volume_eth REAL NOT NULL,
+            PRIMARY KEY (day, role, party)
+        )""",
+        "CREATE INDEX idx_party_daily_role ON party_daily (role, day)",
+    ),
+    (
+        # Typed ledger fields: exact price in gwei, ISO 8601 timestamps, and
+        # buyer/seller identities split out of the "Name (email)" strings.
+        "ALTER TABLE transactions ADD COLUMN price_gwei INTEGER",
+        "UPDATE transactions SET price_gwei = CAST(ROUND(price_eth * 1000000000) AS INTEGER)",
+        "UPDATE transactions SET created_at = REPLACE(created_at, ' ', 'T')",
+        "UPDATE collection_stats SET last_sale_at = REPLACE(last_sale_at, ' ', 'T')",
+        "ALTER TABLE transactions ADD COLUMN buyer_name TEXT",
+        "ALTER TABLE transactions ADD COLUMN buyer_email TEXT",
+        "ALTER TABLE transactions ADD COLUMN seller_name TEXT",
+        "ALTER TABLE transactions ADD COLUMN seller_email TEXT",
+        *(
+            f"""UPDATE transactions SET
+                {party}_name = CASE WHEN {party} LIKE '%(%@%)' THEN RTRIM(SUBSTR({party}, 1, INSTR({party}, '(') - 1)) ELSE {party} END,
+                {party}_email = CASE WHEN {party} LIKE '%(%@%)'
+                    THEN SUBSTR({party}, INSTR({party}, '(') + 1, LENGTH({party}) - INSTR({party}, '(') - 1) END"""
+            for party in ("buyer", "seller")
+        ),
+    ),
+    (
+        # Optimistic concurrency for ownership: every transfer bumps the version.
+        "ALTER TABLE nfts ADD COLUMN version INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE transactions ADD COLUMN nft_id TEXT REFERENCES nfts (id)",
+    ),
+    (
+        # Receipt jobs are claimed before rendering so only one process renders each.
+        "ALTER TABLE receipts ADD COLUMN claimed_by TEXT",
+        "ALTER TABLE receipts ADD COLUMN claimed_at REAL",
+        "CREATE INDEX idx_receipts_running ON receipts (claimed_at) WHERE status = 'running'",
+    ),
+    (
+        # Listings expire server-side (ms since the epoch); existing ones keep the old 5 minute lifespan.
+        "ALTER TABLE nfts ADD COLUMN expires_at INTEGER",
+        "UPDATE nfts SET expires_at = created_at + 300000",
+    ),
+    (
+        # Marketplace-wide totals in a single row, so the summary never aggregates every collection.
+        """CREATE TABLE market_totals (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            sale_count INTEGER NOT NULL,
+            volume_eth REAL NOT NULL,
+            collections INTEGER NOT NULL
+        )""",
+        """INSERT INTO market_totals (id, sale_count, volume_eth, collections)
+           SELECT 1, COALESCE(SUM(sale_count), 0), COALESCE(SUM(volume_eth), 0), COUNT(*) FROM collection_stats""",
+    ),
+    (
+        # Equality filters for /api/get-transactions, so every page is read in id order straight off an index:
+        # the collection ("WW II Tanks #3" -> "WW II Tanks", as analytics.collection_name) and the party names.
+        "ALTER TABLE transactions ADD COLUMN collection TEXT",
+        f"""UPDATE transactions SET collection = COALESCE(NULLIF(CASE
+                WHEN RTRIM(TRIM(nft_name, {_WHITESPACE}), '0123456789') LIKE '%#'
+                     AND RTRIM(TRIM(nft_name, {_WHITESPACE}), '0123456789') <> TRIM(nft_name, {_WHITESPACE})
+                THEN RTRIM(SUBSTR(RTRIM(TRIM(nft_name, {_WHITESPACE}), '0123456789'), 1,
+                                  LENGTH(RTRIM(TRIM(nft_name, {_WHITESPACE}), '0123456789')) - 1), {_WHITESPACE})
+                ELSE TRIM(nft_name, {_WHITESPACE}) END, ''), nft_name)""",
+        "CREATE INDEX idx_transactions_collection ON transactions (collection, id)",
+        "DROP INDEX idx_transactions_buyer",
+        "DROP INDEX idx_transactions_seller",
+        "CREATE INDEX idx_transactions_buyer_name ON transactions (buyer_name, id)",
+        "CREATE INDEX idx_transactions_seller_name ON transactions (seller_name, id)",
+    ),
+    (
+        # All-time totals per party, so window=all top parties reads the head of an index instead of every day.
+        """CREATE TABLE party_totals (
+            role TEXT NOT NULL,
+            party TEXT NOT NULL,
+            sale_count INTEGER NOT NULL,
+            volume_eth REAL NOT NULL,
+            PRIMARY KEY (role, party)
+        )""",
+        """INSERT INTO party_totals (role, party, sale_count, volume_eth)
+           SELECT role, party, SUM(sale_count), SUM(volume_eth) FROM party_daily GROUP BY role, party""",
+        "CREATE INDEX idx_party_totals_volume ON party_totals (role, volume_eth)",
+    ),
+    (
+        # "sale" or "transfer": ownership changes that are not purchases stay in the history but out of the analytics.
+        "ALTER TABLE transactions ADD COLUMN kind TEXT NOT NULL DEFAULT 'sale'",
+    ),
+]
+
+# PRAGMA synchronous levels, from safest to fastest. In WAL mode "full" syncs
+# the log on every commit; "normal" syncs only at checkpoints, so a power loss
+# can drop the latest commits (but never corrupts the file); "off" leaves
+# flushing entirely to the OS.
+SYNCHRONOUS_LEVELS = ("full", "normal", "off")
+
+_db_file = "novamint.db"
+_synchronous = "full"
+_local = threading.local()
+
+
+def get_connection():
+    """Returns this thread's connection to the database, opening it on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.path != _db_file:
+        # isolation_level=None leaves transaction control to explicit BEGIN/COMMIT.
+        conn = sqlite3.connect(_db_file, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={_synchronous}")
+        _local.conn, _local.path = conn, _db_file
+    return conn
+
+
+@contextmanager
+def transaction(conn=None):
+    """Runs the enclosed block inside BEGIN IMMEDIATE ... COMMIT, rolling back on error."""
+    conn = conn or get_connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def init_db(path, synchronous="full"):
+    """Points the module at `path` and brings its schema up to date.
+
+    `synchronous` is the durability level (see SYNCHRONOUS_LEVELS) used by
+    every connection opened afterwards.
+    """
+    global _db_file, _synchronous
+    if synchronous not in SYNCHRONOUS_LEVELS:
+        raise ValueError(f"synchronous must be one of {', '.join(SYNCHRONOUS_LEVELS)}.")
+    _db_file, _synchronous = path, synchronous
+    with transaction() as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {number}")
+
+
+def get_meta(key, default=None):
+    row = get_connection().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row["value"] if row else default
+
+
+def set_meta(key, value, conn=None):
+    (conn or get_connection()).execute(
+        "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+        (key, str(value)),
+    )
@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+
+import metrics
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Optional: without Pillow the feed falls back to the original assets.
+    Image = ImageOps = None
+
+# Errors that mean the source itself cannot be rendered, so retrying is pointless.
+UNRENDERABLE = (Image.UnidentifiedImageError, Image.DecompressionBombError) if Image else ()
+
+# Rendition name -> longest edge in pixels. Feed cards are at most ~400 CSS px
+# wide, so "thumb" covers them at 1x and "medium" at 2x and in detail views.
+SIZES = {"thumb": 480, "medium": 1024}
+WEBP_QUALITY = 80
+
+
+def render(source_path, directory, digest):
+    """Writes the missing WebP renditions of one image; returns stage timings.
+
+    Runs in a worker process. Larger renditions are produced first and each
+    smaller one is scaled down from the previous result, so the original is
+    decoded and resampled only once; JPEGs are decoded straight at reduced
+    scale when they are much larger than the biggest rendition.
+    """
+    timings = {}
+    started = time.perf_counter()
+    missing = [size for size in SIZES if not os.path.exists(_path(directory, digest, size))]
+    if not missing:
+        return timings
+    with Image.open(source_path) as original:
+        largest = max(SIZES[size] for size in missing)
+        original.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(original)
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info else "RGB")
+    timings["derivative_decode"] = time.perf_counter() - started
+    started = time.perf_counter()
+    for size in sorted(missing, key=SIZES.get, reverse=True):
+        image.thumbnail((SIZES[size], SIZES[size]), Image.Resampling.LANCZOS)
+        path = _path(directory, digest, size)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        image.save(tmp_path, "WEBP", quality=WEBP_QUALITY, method=4)
+        os.replace(tmp_path, path)
+    timings["derivative_encode"] = time.perf_counter() - started
+    return timings
+
+
+def _path(directory, digest, size):
+    return os.path.join(directory, digest[:2], f"{digest}.{size}.webp")
+
+
+class DerivativeStore:
+    """Downscaled WebP renditions of assets in an AssetStore, rendered by a pool of worker processes.
+
+    Renditions are keyed by the asset's content hash, like the assets
+    themselves, so each image is rendered once however many NFTs share it and
+    its URLs can be cached forever. `submit()` starts rendering as soon as an
+    asset is stored; `get()` renders on demand for assets that predate this
+    store and waits for a job already in flight rather than starting another.
+    """
+
+    def __init__(self, directory, assets, executor):
+        self.directory = directory
+        self.assets = assets
+        self.executor = executor
+        self.failed = set()
+        self._pending = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def enabled(self):
+        return Image is not None
+
+    def path(self, asset_id, size):
+        return _path(self.directory, asset_id.split(".")[0], size)
+
+    def submit(self, asset_id):
+        """Queues rendering of every missing size of `asset_id`; returns the job's future, or None if there is nothing to do."""
+        digest = asset_id.split(".")[0]
+        if not self.enabled or digest in self.failed:
+            return None
+        if all(os.path.exists(self.path(asset_id, size)) for size in SIZES):
+            return None
+        with self._lock:
+            future = self._pending.get(digest)
+            started = future is None
+            if started:
+                future = self._pending[digest] = self.executor.submit(
+                    render, self.assets.path(asset_id), self.directory, digest)
+        # Outside the lock: a job that already finished runs the callback, which takes it, right here.
+        if started:
+            future.add_done_callback(lambda f: self._finished(digest, f))
+        return future
+
+    def get(self, asset_id, size, timeout=30):
+        """Returns the path of one rendition, rendering it first if needed, or None if it cannot be produced."""
+        path = self.path(asset_id, size)
+        if os.path.exists(path):
+            return path
+        future = self.submit(asset_id)
+        if future is None:
+            return path if os.path.exists(path) else None
+        try:
+            future.result(timeout)
+        except Exception:
+            return None
+        return path
+
+    def _finished(self, digest, future):
+        with self._lock:
+            self._pending.pop(digest, None)
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error:
+            print(f"Image Derivative Error: {error!r}")
+            # Only an image Pillow cannot read is given up on; anything else
+            # (a full disk, a crashed worker) is retried by the next request.
+            if isinstance(error, UNRENDERABLE):
+                self.failed.add(digest)
+            return
+        for stage, seconds in future.result().items():
+            metrics.observe_stage(stage, seconds)
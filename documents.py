@@ -0,0 +1,109 @@
+import os
+import time
+
+from fpdf import FPDF
+
+
+class PDF(FPDF):
+    def header(self):
+        self.set_font('Arial', 'B', 12)
+        self.cell(0, 10, 'NovaMint Document', 0, 1, 'C')
+        self.ln(10)
+    def footer(self):
+        self.set_y(-15); self.set_font('Arial', 'I', 8); self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
+
+
+def receipt_text(fields):
+    return (
+        f"--- NovaMint Transaction Receipt ---\n\n"
+        f"Item: {fields['item']}\n"
+        f"Price: {fields['price']} ETH\n"
+        f"Seller: {fields['seller']}\n"
+        f"Buyer: {fields['buyer']}\n"
+        f"Date: {fields['date']}\n\n"
+        f"This document certifies the simulated purchase of the above NFT."
+    )
+
+
+def receipt_filename(nft_name, stamp, receipt_id=None):
+    """A receipt's PDF filename: the NFT name reduced to letters, digits and "_", plus the receipt id if given."""
+    safe_name = "".join(c for c in nft_name.replace(' ', '_') if c.isalnum() or c == '_')
+    suffix = f"_{receipt_id}" if receipt_id else ""
+    return f"receipt_{safe_name}_{stamp}{suffix}.pdf"
+
+
+def contract_filename(filename):
+    """Maps a requested .sol filename to the sanitized name of its PDF."""
+    pdf_filename = filename.replace('.sol', '.pdf')
+    return "".join([c for c in pdf_filename if c.isalpha() or c.isdigit() or c in ('.','_')]).rstrip()
+
+
+def _receipt_page(pdf, fields):
+    pdf.add_page(); pdf.set_font("Arial", size=12); pdf.multi_cell(0, 10, txt=receipt_text(fields))
+
+
+def _contract_page(pdf, item):
+    pdf.add_page(); pdf.set_font("Courier", size=10); pdf.multi_cell(0, 5, txt=item["code"])
+
+
+PAGE_RENDERERS = {"receipt": _receipt_page, "contract": _contract_page}
+
+
+def _write(pdf, filepath, started):
+    """Writes `pdf` to `filepath`; returns the seconds spent on layout and on the file write.
+
+    `started` is when the caller began building the document, so the layout
+    time covers the page renderer as well as FPDF's output(). Timings are
+    returned rather than recorded because this may run in a worker process,
+    whose metrics the server would never see.
+    """
+    data = pdf.output(dest='S').encode('latin-1')
+    laid_out = time.perf_counter()
+    with open(filepath, 'wb') as f:
+        f.write(data)
+    return {"pdf_layout": laid_out - started, "file_write": time.perf_counter() - laid_out}
+
+
+def render_receipt(filepath, fields):
+    """Lays out a purchase receipt and writes it to `filepath`; returns the stage timings.
+
+    Kept free of Flask/app imports so it can run in a worker process.
+    """
+    started = time.perf_counter()
+    pdf = PDF(orientation='P', unit='mm', format='A4'); _receipt_page(pdf, fields)
+    return _write(pdf, filepath, started)
+
+
+def render_contract(filepath, code):
+    started = time.perf_counter()
+    pdf = PDF(); _contract_page(pdf, {"code": code})
+    return _write(pdf, filepath, started)
+
+
+def render_chunk(kind, items, output_dir=None):
+    """Renders each item (a dict with a "filename") as its own PDF, for batch jobs.
+
+    Writes into `output_dir` and returns the filenames, or, when `output_dir` is
+    None, returns (filename, pdf_bytes) pairs for the caller to archive. A worker
+    handles a whole chunk so FPDF's font metrics, loaded once per process, are
+    shared by every document in it.
+    """
+    add_page = PAGE_RENDERERS[kind]
+    results = []
+    for item in items:
+        pdf = PDF(); add_page(pdf, item)
+        if output_dir is None:
+            results.append((item["filename"], pdf.output(dest='S').encode('latin-1')))
+        else:
+            pdf.output(os.path.join(output_dir, item["filename"]))
+            results.append(item["filename"])
+    return results
+
+
+def render_combined(filepath, kind, items):
+    """Renders every item as consecutive pages of a single PDF."""
+    pdf = PDF(); add_page = PAGE_RENDERERS[kind]
+    for item in items:
+        add_page(pdf, item)
+    pdf.output(filepath)
+    return filepath
@@ -1,7 +1,21 @@
+import argparse
+import bz2
+import hashlib
+import json
+import lzma
 import os
+import struct
 import textwrap
+import time
 import zipfile
-import io
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard
+except ImportError:  # Optional: only needed for --format zstd.
+    zstandard = None
 
 print("Preparing to create the NovaMint project ZIP file with API key included...")
 
@@ -1063,20 +1077,243 @@ project_files = {
     """,
 }
 
-def create_project_zip():
-    """Creates a zip file containing the entire project structure."""
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        for filepath, content in project_files.items():
-            file_content_bytes = textwrap.dedent(content).strip().encode('utf-8')
-            zip_file.writestr(filepath, file_content_bytes)
-    
-    zip_filename = "novamint-enhanced.zip"
-    with open(zip_filename, "wb") as f:
-        f.write(zip_buffer.getvalue())
-        
-    print(f"\nProject successfully created as '{zip_filename}'!")
-    print("You can now unzip this file and follow the setup instructions.")
+ZIP_FILENAME = "novamint-enhanced.zip"
+COPY_CHUNK_SIZE = 1024 * 1024
+# ZIP compression method ids; 93 is Zstandard (APPNOTE 6.3.8), which Python's
+# zipfile can only read from 3.14 on, so it is opt-in.
+COMPRESSION_METHODS = {
+    "deflate": zipfile.ZIP_DEFLATED, "store": zipfile.ZIP_STORED,
+    "bzip2": zipfile.ZIP_BZIP2, "lzma": zipfile.ZIP_LZMA, "zstd": 93,
+}
+# Every member gets the same timestamp and permissions so identical input
+# always yields a byte-identical archive. SOURCE_DATE_EPOCH overrides the date.
+DEFAULT_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+MEMBER_ATTRIBUTES = 0o100644 << 16
+# ZIP record layouts (APPNOTE 4.3.7, 4.3.12 and 4.3.16) and the "version
+# needed to extract" of each compression method that is newer than deflate.
+LOCAL_HEADER_FORMAT = "<4s2B4HL2L2H"
+CENTRAL_HEADER_FORMAT = "<4s4B4HL2L5H2L"
+END_RECORD_FORMAT = "<4s4H2LH"
+LOCAL_HEADER_SIZE = struct.calcsize(LOCAL_HEADER_FORMAT)
+ZIP32_LIMIT = 0xFFFFFFFF
+MIN_VERSIONS = {zipfile.ZIP_BZIP2: 46, zipfile.ZIP_LZMA: 63, 93: 63}
+LZMA_FILTER = {"id": lzma.FILTER_LZMA1, "lc": 3, "lp": 0, "pb": 2, "dict_size": 1 << 23}
+LZMA_HEADER = struct.pack("<BBHB", 9, 4, 5, (LZMA_FILTER["pb"] * 5 + LZMA_FILTER["lp"]) * 9 + LZMA_FILTER["lc"]) \
+    + struct.pack("<L", LZMA_FILTER["dict_size"])
+
+
+def manifest_path(zip_filename):
+    return f"{zip_filename}.manifest.json"
+
+
+def load_manifest(zip_filename, settings):
+    """Returns {name: {"sha256", "crc", "compress_size"}} from the previous build, or {} if unusable.
+
+    Members are only reusable if they were compressed with the same `settings`.
+    """
+    try:
+        with open(manifest_path(zip_filename)) as f:
+            manifest = json.load(f)
+        return manifest["entries"] if manifest.get("settings") == settings else {}
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def build_date_time():
+    epoch = os.getenv("SOURCE_DATE_EPOCH")
+    if not epoch:
+        return DEFAULT_DATE_TIME
+    return max(DEFAULT_DATE_TIME, time.gmtime(int(epoch))[:6])
+
+
+def compress_member(data, compression, level):
+    """Compresses one member's bytes as they are stored in the archive; returns (crc, compressed).
+
+    zlib, bz2, lzma and zstandard all release the GIL while compressing, so a
+    thread pool compresses members in parallel without pickling them.
+    """
+    if compression == "store":
+        compressed = data
+    elif compression == "deflate":
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION if level is None else level, zlib.DEFLATED, -15)
+        compressed = compressor.compress(data) + compressor.flush()
+    elif compression == "bzip2":
+        compressed = bz2.compress(data, 9 if level is None else level)
+    elif compression == "lzma":
+        # ZIP's LZMA members (APPNOTE 5.8.8): LZMA SDK version 9.4, then the
+        # length and bytes of the raw LZMA1 properties (lc=3, lp=0, pb=2, 8 MiB
+        # dictionary), then the raw stream with an end marker. Like zipfile, this ignores `level`.
+        compressor = lzma.LZMACompressor(lzma.FORMAT_RAW, filters=[LZMA_FILTER])
+        compressed = LZMA_HEADER + compressor.compress(data) + compressor.flush()
+    else:
+        if zstandard is None:
+            raise RuntimeError("zstd compression needs the 'zstandard' package (pip install zstandard).")
+        compressed = zstandard.ZstdCompressor(level=3 if level is None else level).compress(data)
+    return zlib.crc32(data), compressed
+
+
+class ArchiveWriter:
+    """Writes a ZIP archive to a binary file from members that are already compressed.
+
+    Local headers, the central directory and the end record are packed here
+    straight from the format (APPNOTE 4.3), the same bytes zipfile writes for
+    such members, rather than by pushing data through a ZipFile's internals.
+    Archives that would need Zip64 (over 4 GiB or 65535 members) are refused.
+    """
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.members = []
+
+    def append(self, info, chunks):
+        """Writes a member whose CRC and sizes are already set on `info`, from an iterable of compressed chunks."""
+        if max(info.file_size, info.compress_size, self.fp.tell()) > ZIP32_LIMIT:
+            raise ValueError("The archive is too large for a ZIP file without Zip64.")
+        # Newer formats need newer readers; sizes go in the local header, so there is no data descriptor.
+        info.extract_version = info.create_version = max(20, MIN_VERSIONS.get(info.compress_type, 0))
+        filename, info.flag_bits = _encoded_name(info.filename)
+        info.header_offset = self.fp.tell()
+        self.fp.write(struct.pack(
+            LOCAL_HEADER_FORMAT, b"PK\x03\x04", info.extract_version, 0, info.flag_bits, info.compress_type,
+            *_dos_time(info.date_time), info.CRC, info.compress_size, info.file_size, len(filename), 0,
+        ) + filename)
+        for chunk in chunks:
+            self.fp.write(chunk)
+        self.members.append(info)
+
+    def close(self):
+        """Writes the central directory and end record after the last member."""
+        start = self.fp.tell()
+        if len(self.members) > 0xFFFF or start > ZIP32_LIMIT:
+            raise ValueError("The archive is too large for a ZIP file without Zip64.")
+        for info in self.members:
+            filename, flag_bits = _encoded_name(info.filename)
+            self.fp.write(struct.pack(
+                CENTRAL_HEADER_FORMAT, b"PK\x01\x02", info.create_version, info.create_system,
+                info.extract_version, 0, flag_bits, info.compress_type, *_dos_time(info.date_time), info.CRC,
+                info.compress_size, info.file_size, len(filename), 0, 0, 0, info.internal_attr,
+                info.external_attr, info.header_offset,
+            ) + filename)
+        size = self.fp.tell() - start
+        self.fp.write(struct.pack(END_RECORD_FORMAT, b"PK\x05\x06", 0, 0, len(self.members), len(self.members),
+                                  size, start, 0))
+
+
+def _encoded_name(name):
+    # Bit 11 of the flags marks a UTF-8 name; ASCII names are written as they are.
+    try:
+        return name.encode("ascii"), 0
+    except UnicodeEncodeError:
+        return name.encode("utf-8"), 0x800
+
+
+def _dos_time(date_time):
+    year, month, day, hour, minute, second = date_time
+    return hour << 11 | minute << 5 | second // 2, (year - 1980) << 9 | month << 5 | day
+
+
+def _raw_chunks(source, info):
+    source.seek(info.header_offset)
+    header = source.read(LOCAL_HEADER_SIZE)
+    name_length, extra_length = struct.unpack("<HH", header[26:30])
+    source.seek(name_length + extra_length, os.SEEK_CUR)
+    remaining = info.compress_size
+    while remaining:
+        chunk = source.read(min(COPY_CHUNK_SIZE, remaining))
+        remaining -= len(chunk)
+        yield chunk
+
+
+def _old_member(old_zip, name):
+    if old_zip is None:
+        return None
+    try:
+        return old_zip.getinfo(name)
+    except KeyError:
+        return None
+
+
+def _member_info(filepath, date_time, method, crc, file_size, compress_size):
+    info = zipfile.ZipInfo(filepath, date_time)
+    info.compress_type, info.external_attr, info.create_system = method, MEMBER_ATTRIBUTES, 3
+    info.CRC, info.file_size, info.compress_size = crc, file_size, compress_size
+    return info
+
+
+def create_project_zip(zip_filename=ZIP_FILENAME, files=None, compression="deflate", level=None, workers=None):
+    """Creates a zip file containing the entire project structure.
+
+    Members are compressed with `compression` (see COMPRESSION_METHODS) at
+    `level` by a pool of `workers` threads, at most a few per worker in flight,
+    and written in sorted name order with fixed timestamps, so the same input
+    always produces a byte-identical archive whatever the worker count.
+    Entries stream into a temporary file that replaces the archive once
+    complete. A manifest of content hashes from the previous build lets
+    unchanged entries be copied over from the old archive as already-compressed
+    members. Returns (written, copied).
+    """
+    if compression not in COMPRESSION_METHODS:
+        raise ValueError(f"compression must be one of {', '.join(COMPRESSION_METHODS)}.")
+    files = project_files if files is None else files
+    workers = workers or os.cpu_count() or 1
+    settings = {"compression": compression, "level": level}
+    date_time, method = build_date_time(), COMPRESSION_METHODS[compression]
+    previous = load_manifest(zip_filename, settings) if os.path.exists(zip_filename) else {}
+    old_zip = zipfile.ZipFile(zip_filename) if previous else None
+    manifest, written, copied = {}, 0, 0
+    tmp_filename = f"{zip_filename}.{os.getpid()}.tmp"
+
+    def prepare(filepath):
+        # Hashing the source as given skips dedenting unchanged entries, the costliest step.
+        content = files[filepath]
+        digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        entry = previous.get(filepath)
+        old_info = _old_member(old_zip, filepath)
+        if (entry and old_info and entry["sha256"] == digest and entry["crc"] == old_info.CRC
+                and entry["compress_size"] == old_info.compress_size and old_info.date_time == date_time):
+            return digest, old_info, None
+        data = textwrap.dedent(content).strip().encode('utf-8')
+        crc, compressed = compress_member(data, compression, level)
+        return digest, _member_info(filepath, date_time, method, crc, len(data), len(compressed)), compressed
+
+    try:
+        with open(zip_filename, "rb") if old_zip else open(os.devnull, "rb") as source, \
+                open(tmp_filename, "wb") as archive_file, ThreadPoolExecutor(workers) as pool:
+            archive = ArchiveWriter(archive_file)
+            pending, names = deque(), iter(sorted(files))
+            while True:
+                # Keep the pool busy while writing members strictly in order.
+                while len(pending) < workers * 4 and (filepath := next(names, None)) is not None:
+                    pending.append(pool.submit(prepare, filepath))
+                if not pending:
+                    break
+                digest, info, compressed = pending.popleft().result()
+                if compressed is None:
+                    old_info, info = info, _member_info(info.filename, date_time, method, info.CRC,
+                                                        info.file_size, info.compress_size)
+                    archive.append(info, _raw_chunks(source, old_info)); copied += 1
+                else:
+                    archive.append(info, [compressed]); written += 1
+                manifest[info.filename] = {"sha256": digest, "crc": info.CRC, "compress_size": info.compress_size}
+            archive.close()
+        os.replace(tmp_filename, zip_filename)
+    finally:
+        if old_zip:
+            old_zip.close()
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+    with open(f"{manifest_path(zip_filename)}.tmp", "w") as f:
+        json.dump({"settings": settings, "entries": manifest}, f, indent=1)
+    os.replace(f"{manifest_path(zip_filename)}.tmp", manifest_path(zip_filename))
+    return written, copied
 
 if __name__ == "__main__":
-    create_project_zip()
+    parser = argparse.ArgumentParser(description="Package the NovaMint project as a zip file.")
+    parser.add_argument("--output", default=ZIP_FILENAME)
+    parser.add_argument("--format", choices=list(COMPRESSION_METHODS), default="deflate")
+    parser.add_argument("--level", type=int, help="compression level (format default if omitted)")
+    parser.add_argument("--workers", type=int, help="compression threads (default: CPU count)")
+    args = parser.parse_args()
+    written, copied = create_project_zip(args.output, compression=args.format, level=args.level, workers=args.workers)
+    print(f"\nProject successfully created as '{args.output}'! ({written} entries compressed, {copied} reused)")
+    print("You can now unzip this file and follow the setup instructions.")
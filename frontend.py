@@ -0,0 +1,137 @@
+"""Build step and request handler for serving the HTML pages and stylesheet from Flask.
+
+    python frontend.py [build dir]      # app.py also runs this at startup when sources changed
+
+Static assets (style.css) are published under content-hashed names such as
+/assets/css/style.3f2a9c1e.css and served with a one-year immutable
+Cache-Control; the pages that reference them are rewritten to those names and
+served under their usual URLs with `no-cache`, so browsers revalidate them
+cheaply (ETag/304) and pick up new asset URLs as soon as they change. Every
+file is precompressed to gzip and, when the `brotli` package is installed,
+brotli, and the best encoding the client accepts is sent as-is.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+
+from flask import abort, request, send_file
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip variants are built.
+    brotli = None
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+PAGES = ("index.html", "dashboard.html", "mint.html", "upload.html")
+# Source file -> public path before fingerprinting (what the pages link to).
+STATIC_ASSETS = {"style.css": "assets/css/style.css"}
+MIMETYPES = {".html": "text/html", ".css": "text/css"}
+IMMUTABLE_MAX_AGE = 31536000
+MANIFEST_FILE = "manifest.json"
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _publish(build_dir, name, data):
+    """Stores `data` and its precompressed variants under a content-hashed file name; returns its manifest entry."""
+    digest = _digest(data)
+    root, ext = os.path.splitext(name)
+    stored = f"{root}.{digest[:16]}{ext}"
+    variants = {"identity": stored, "gzip": f"{stored}.gz"}
+    if brotli is not None:
+        variants["br"] = f"{stored}.br"
+    if not all(os.path.exists(os.path.join(build_dir, path)) for path in variants.values()):
+        _write_atomic(os.path.join(build_dir, variants["identity"]), data)
+        # mtime=0 keeps the gzip bytes, like the file names, a pure function of the content.
+        _write_atomic(os.path.join(build_dir, variants["gzip"]), gzip.compress(data, 9, mtime=0))
+        if "br" in variants:
+            _write_atomic(os.path.join(build_dir, variants["br"]), brotli.compress(data, quality=11))
+    return {"etag": digest[:32], "mimetype": MIMETYPES.get(ext, "application/octet-stream"), "variants": variants}
+
+
+def build(build_dir, source_dir=SOURCE_DIR):
+    """Fingerprints and precompresses the frontend into `build_dir`; returns the manifest.
+
+    Output files are named by content, so concurrent builds (one per worker
+    process) cannot conflict, and the manifest is replaced atomically last.
+    Skips all work when the sources are unchanged since the last build.
+    """
+    sources = {}
+    for name in (*STATIC_ASSETS, *PAGES):
+        with open(os.path.join(source_dir, name), "rb") as f:
+            sources[name] = f.read()
+    source_digest = _digest(b"".join(_digest(data).encode() for data in sources.values()))
+    manifest_path = os.path.join(build_dir, MANIFEST_FILE)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("sources") == source_digest and manifest.get("brotli") == (brotli is not None):
+            return manifest
+    except (OSError, ValueError):
+        pass
+    os.makedirs(build_dir, exist_ok=True)
+    routes, rewrites = {}, []
+    for name, public_path in STATIC_ASSETS.items():
+        entry = _publish(build_dir, name, sources[name])
+        root, ext = os.path.splitext(public_path)
+        url = f"{root}.{entry['etag'][:16]}{ext}"
+        routes[url] = dict(entry, immutable=True)
+        # Matches "assets/css/style.css", "/assets/css/style.css", "style.css", ... in attributes.
+        pattern = re.compile(rb"""(["'])/?(?:[\w.-]+/)*""" + re.escape(os.path.basename(public_path).encode()) + rb"\1")
+        rewrites.append((pattern, f"/{url}".encode()))
+    for name in PAGES:
+        data = sources[name]
+        for pattern, url in rewrites:
+            data = pattern.sub(lambda m, url=url: m.group(1) + url + m.group(1), data)
+        routes[name] = dict(_publish(build_dir, name, data), immutable=False)
+    manifest = {"sources": source_digest, "brotli": brotli is not None, "routes": routes}
+    _write_atomic(manifest_path, json.dumps(manifest, indent=1).encode())
+    return manifest
+
+
+class FrontendAssets:
+    """Serves the built frontend: `serve(path)` returns a Flask response or aborts with 404."""
+
+    def __init__(self, build_dir, manifest):
+        self.build_dir = build_dir
+        self.routes = manifest["routes"]
+
+    def serve(self, path):
+        entry = self.routes.get(path)
+        if entry is None:
+            abort(404)
+        variants = entry["variants"]
+        encoding = request.accept_encodings.best_match([e for e in ("br", "gzip") if e in variants]) or "identity"
+        response = send_file(
+            os.path.abspath(os.path.join(self.build_dir, variants[encoding])), mimetype=entry["mimetype"],
+            conditional=True, etag=entry["etag"] if encoding == "identity" else f"{entry['etag']}-{encoding}",
+            max_age=IMMUTABLE_MAX_AGE if entry["immutable"] else None,
+        )
+        # send_file names the stored variant ("style.<hash>.css.br"), which is not what the browser asked for.
+        del response.headers["Content-Disposition"]
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        if entry["immutable"]:
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response
+
+
+if __name__ == "__main__":
+    build_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join("build", "frontend")
+    routes = build(build_dir)["routes"]
+    print(f"Built {len(routes)} frontend files into {build_dir}.")
@@ -0,0 +1,124 @@
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+import db
+
+
+class WriterStopped(RuntimeError):
+    """The writer thread died before this write was committed; nothing of it was written."""
+
+
+class GroupCommitWriter:
+    """Runs database writes on one thread, committing many of them together.
+
+    Callers hand `run()` a function of a connection. The writer thread drains
+    whatever has queued up (up to `max_batch`, waiting at most `max_wait`
+    seconds for stragglers) into a single BEGIN IMMEDIATE ... COMMIT, so with
+    PRAGMA synchronous=FULL a burst of purchases costs one fsync instead of one
+    each. Every function runs under its own SAVEPOINT: one that raises is rolled
+    back alone and its caller gets the exception. `run()` returns only after
+    the batch has committed.
+
+    Writes from other processes are serialized by SQLite's file locks; the
+    connection's busy timeout makes each batch wait its turn. With
+    `enabled=False` every call commits on its own on the calling thread.
+
+    If the writer thread dies (a function raised something other than an
+    Exception), the writes it held and everything still queued fail with
+    WriterStopped, so no caller waits forever; the next `run()` starts a
+    new thread.
+    """
+
+    def __init__(self, max_batch=256, max_wait=0.002, enabled=True):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.enabled = enabled
+        self.batches = 0
+        self.writes = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+
+    def run(self, fn, inline=False):
+        """Runs `fn(conn)` in a committed transaction and returns its result.
+
+        `inline=True` commits this one write by itself on the calling thread,
+        e.g. so a profiler watching that thread sees it.
+        """
+        if inline or not self.enabled:
+            with db.transaction() as conn:
+                return fn(conn)
+        future = Future()
+        # Queued under the lock so a dying thread cannot miss it when draining.
+        with self._lock:
+            self._ensure_thread()
+            self._queue.put((fn, future))
+        return future.result()
+
+    def stats(self):
+        with self._lock:
+            return {"batches": self.batches, "writes": self.writes}
+
+    def _ensure_thread(self):
+        # Threads do not survive fork(), so each pre-forked worker starts its own.
+        if self._pid != os.getpid() or self._thread is None:
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._loop, name="group-commit", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        batch = []
+        try:
+            while True:
+                batch = [self._queue.get()]
+                try:
+                    while len(batch) < self.max_batch:
+                        batch.append(self._queue.get(timeout=self.max_wait))
+                except queue.Empty:
+                    pass
+                self._commit(batch)
+                batch = []
+        except BaseException as e:
+            with self._lock:
+                self._thread = None
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+            error = WriterStopped(f"group-commit writer stopped: {e!r}")
+            error.__cause__ = e
+            print(f"Group Commit Error: {error}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+
+    def _commit(self, batch):
+        results = []
+        try:
+            with db.transaction() as conn:
+                for fn, future in batch:
+                    conn.execute("SAVEPOINT write")
+                    try:
+                        results.append((future, fn(conn), None))
+                        conn.execute("RELEASE write")
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO write")
+                        conn.execute("RELEASE write")
+                        results.append((future, None, e))
+        except Exception as e:
+            # BEGIN or COMMIT failed, so nothing in the batch was written.
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        with self._lock:
+            self.batches += 1
+            self.writes += len(batch)
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_prompt(prompt):
+    # Stability's CLIP tokenizer lowercases and ignores repeated whitespace, so
+    # these variants produce the same image and should share a cache entry.
+    return " ".join(prompt.lower().split())
+
+
+class ImageCache:
+    """Content-addressed cache of generated images with an in-memory hot tier.
+
+    Entries are keyed by a hash of everything that determines the output (the
+    normalized prompt plus generation parameters) and stored on disk as
+    <dir>/<key[:2]>/<key>.png. Both tiers evict least-recently-used entries once
+    over their byte budget. Disk recency survives restarts via file mtimes.
+    """
+
+    def __init__(self, directory, max_bytes, memory_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._disk = OrderedDict()
+        self._disk_size = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def key(prompt, params):
+        material = json.dumps({"prompt": normalize_prompt(prompt), **params}, sort_keys=True)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.png")
+
+    def get(self, key):
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits["memory"] += 1
+                return data
+            known = key in self._disk
+        if known:
+            try:
+                with open(self.path(key), "rb") as f:
+                    data = f.read()
+                os.utime(self.path(key))
+            except FileNotFoundError:
+                # Evicted by another worker process sharing the directory.
+                data = None
+        with self._lock:
+            if data is None:
+                self._forget(key)
+                self.misses += 1
+                return None
+            self._disk.move_to_end(key)
+            self.hits["disk"] += 1
+            self._remember(key, data)
+        return data
+
+    def put(self, key, data):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            if key not in self._disk:
+                self._disk[key] = len(data)
+                self._disk_size += len(data)
+            self._disk.move_to_end(key)
+            self._remember(key, data)
+            evicted = self._evict_disk()
+        for old_key in evicted:
+            try:
+                os.remove(self.path(old_key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": dict(self.hits), "misses": self.misses,
+                "entries": len(self._disk), "bytes": self._disk_size,
+                "memoryEntries": len(self._memory), "memoryBytes": self._memory_size,
+            }
+
+    def _load_index(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".png"):
+                    stat = os.stat(os.path.join(root, name))
+                    entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_size += size
+        for old_key in self._evict_disk():
+            os.remove(self.path(old_key))
+
+    # The helpers below expect self._lock to be held.
+    def _remember(self, key, data):
+        if len(data) > self.memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_size -= len(self._memory.pop(key))
+        self._memory[key] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_bytes:
+            _, old = self._memory.popitem(last=False)
+            self._memory_size -= len(old)
+
+    def _forget(self, key):
+        size = self._disk.pop(key, None)
+        if size is not None:
+            self._disk_size -= size
+
+    def _evict_disk(self):
+        evicted = []
+        while self._disk_size > self.max_bytes and len(self._disk) > 1:
+            old_key, size = self._disk.popitem(last=False)
+            self._disk_size -= size
+            if old_key in self._memory:
+                self._memory_size -= len(self._memory.pop(old_key))
+            evicted.append(old_key)
+        return evicted
+
+
+class SearchEntry:
+    def __init__(self, results):
+        self.results = results
+        self.fetched_at = time.monotonic()
+        # Plain requests always get candidate 0, so "another" starts from 1.
+        self.next_index = 1
+
+
+class SearchCache:
+    """TTL + LRU cache of search results keyed by normalized query.
+
+    Entries older than `ttl` seconds are stale: `lookup` still returns them
+    (flagged as not fresh) until `max_age`, so callers can keep serving them
+    when refreshing is not possible or not affordable.
+    """
+
+    def __init__(self, max_entries, ttl, max_age):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_age = max_age
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def lookup(self, query):
+        """Returns (entry, fresh); entry is None when nothing usable is cached."""
+        with self._lock:
+            entry = self._entries.get(query)
+            if entry is None:
+                return None, False
+            age = time.monotonic() - entry.fetched_at
+            if age > self.max_age:
+                del self._entries[query]
+                return None, False
+            self._entries.move_to_end(query)
+            return entry, age <= self.ttl
+
+    def put(self, query, results):
+        entry = SearchEntry(results)
+        with self._lock:
+            self._entries[query] = entry
+            self._entries.move_to_end(query)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def advance(self, entry):
+        """Returns the index of the next candidate in `entry`, cycling through them."""
+        with self._lock:
+            index = entry.next_index % len(entry.results)
+            entry.next_index = index + 1
+            return index
+
+    def record(self, status):
+        with self._lock:
+            if status == "HIT": self.hits += 1
+            elif status == "STALE": self.stale_hits += 1
+            else: self.misses += 1
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "staleHits": self.stale_hits, "misses": self.misses, "entries": len(self._entries)}
@@ -0,0 +1,232 @@
+import asyncio
+import base64
+import threading
+import time
+
+import metrics
+from image_cache import ImageCache, normalize_prompt
+from upstream import CircuitOpenError
+
+STABILITY_ENGINE_ID = "stable-diffusion-v1-6"
+GENERATION_PARAMS = {"cfg_scale": 7, "height": 512, "width": 512, "samples": 1, "steps": 30}
+
+# Handlers in this module return (body, status, headers) so the Flask app and the
+# ASGI entry point (asgi.py) can share them; `ahandle` is the non-blocking twin
+# of `handle` and needs `async_client` to be set.
+
+
+class AIImageService:
+    """Text-to-image generation through Stability, backed by the image cache and asset store."""
+
+    def __init__(self, api_key, client, cache, assets, flights, derivatives=None):
+        self.api_key = api_key
+        self.client = client
+        self.async_client = None
+        self.cache = cache
+        self.assets = assets
+        self.flights = flights
+        self.derivatives = derivatives
+
+    def handle(self, data, asset_url):
+        prompt, error = self._validate(data)
+        if error: return error
+        key = self._cache_key(prompt)
+        try:
+            image_bytes = self.cache.get(key); cache_status = "HIT"
+            if image_bytes is None:
+                # Identical prompts already being generated share that upstream call.
+                cache_status = "MISS"
+                image_bytes = self.flights.do(("stability", key), lambda: self._generate(prompt, key))
+            return self._stored(image_bytes, cache_status, asset_url)
+        except CircuitOpenError as e:
+            return {"error": str(e)}, 503, {}
+        except Exception as e:
+            print(f"AI Generation Error: {e}")
+            return {"error": f"Failed to generate AI image: {e}"}, 500, {}
+
+    async def ahandle(self, data, asset_url):
+        prompt, error = self._validate(data)
+        if error: return error
+        key = self._cache_key(prompt)
+        try:
+            # Cache and asset I/O touch the disk, so keep them off the event loop.
+            image_bytes = await asyncio.to_thread(self.cache.get, key); cache_status = "HIT"
+            if image_bytes is None:
+                cache_status = "MISS"
+                image_bytes = await self.flights.ado(("stability", key), lambda: self._agenerate(prompt, key))
+            return await asyncio.to_thread(self._stored, image_bytes, cache_status, asset_url)
+        except CircuitOpenError as e:
+            return {"error": str(e)}, 503, {}
+        except Exception as e:
+            print(f"AI Generation Error: {e}")
+            return {"error": f"Failed to generate AI image: {e}"}, 500, {}
+
+    def _generate(self, prompt, key):
+        # A flight that just finished may have filled the cache after our lookup.
+        image_bytes = self.cache.get(key)
+        if image_bytes is None:
+            response = self.client.post(self._path(), json=self._payload(prompt))
+            response.raise_for_status()
+            image_bytes = self._decode(response.json())
+            with metrics.stage("image_cache_write"):
+                self.cache.put(key, image_bytes)
+        return image_bytes
+
+    async def _agenerate(self, prompt, key):
+        image_bytes = await asyncio.to_thread(self.cache.get, key)
+        if image_bytes is None:
+            response = await self.async_client.post(self._path(), json=self._payload(prompt))
+            response.raise_for_status()
+            image_bytes = self._decode(response.json())
+            with metrics.stage("image_cache_write"):
+                await asyncio.to_thread(self.cache.put, key, image_bytes)
+        return image_bytes
+
+    def _validate(self, data):
+        if not isinstance(data, dict): return None, ({"error": "JSON object required"}, 400, {})
+        if not self.api_key:
+            return None, ({"error": "AI service is not configured on the server."}, 500, {})
+        prompt = data.get('prompt')
+        if not prompt or not isinstance(prompt, str): return None, ({"error": "Prompt is required"}, 400, {})
+        return prompt, None
+
+    @staticmethod
+    def _cache_key(prompt):
+        return ImageCache.key(prompt, {"engine": STABILITY_ENGINE_ID, **GENERATION_PARAMS})
+
+    @staticmethod
+    def _path():
+        return f"/v1/generation/{STABILITY_ENGINE_ID}/text-to-image"
+
+    @staticmethod
+    def _payload(prompt):
+        return {"text_prompts": [{"text": prompt}], **GENERATION_PARAMS}
+
+    @staticmethod
+    def _decode(response_data):
+        with metrics.stage("image_decode"):
+            return base64.b64decode(response_data['artifacts'][0]['base64'])
+
+    def _stored(self, image_bytes, cache_status, asset_url):
+        with metrics.stage("asset_write"):
+            asset_id = self.assets.save(image_bytes, "image/png")
+        if self.derivatives is not None:
+            self.derivatives.submit(asset_id)
+        return {"assetId": asset_id, "imageUrl": asset_url(asset_id)}, 200, {"X-Cache": cache_status}
+
+
+class StockImageService:
+    """Stock photo lookup through the Pexels search API.
+
+    Each query fetches a page of `page_size` candidates once and caches it, so
+    repeats and "another" requests (which cycle through the candidates) do not
+    hit Pexels. Expired entries are refreshed only while the Pexels quota is
+    above `quota_reserve`; below it, or if Pexels throttles or fails, stale
+    results keep being served.
+    """
+
+    def __init__(self, api_key, client, cache, flights, page_size=15, quota_reserve=20):
+        self.api_key = api_key
+        self.client = client
+        self.async_client = None
+        self.cache = cache
+        self.flights = flights
+        self.page_size = page_size
+        self.quota_reserve = quota_reserve
+        self.quota_remaining = None
+        self.quota_reset = None
+        self._quota_lock = threading.Lock()
+
+    def handle(self, data):
+        prompt, error = self._validate(data)
+        if error: return error
+        query = normalize_prompt(prompt)
+        entry, cache_status = self._lookup(query)
+        if cache_status in ("HIT", "STALE"): return self._pick(entry, data, cache_status)
+        if cache_status == "QUOTA": return self._quota_exhausted()
+        try:
+            entry, served_stale = self.flights.do(("pexels", query), lambda: self._refresh(query, entry))
+        except Exception as e:
+            return self._failed(e, entry, data)
+        return self._pick(entry, data, "STALE" if served_stale else cache_status)
+
+    async def ahandle(self, data):
+        prompt, error = self._validate(data)
+        if error: return error
+        query = normalize_prompt(prompt)
+        entry, cache_status = self._lookup(query)
+        if cache_status in ("HIT", "STALE"): return self._pick(entry, data, cache_status)
+        if cache_status == "QUOTA": return self._quota_exhausted()
+        try:
+            entry, served_stale = await self.flights.ado(("pexels", query), lambda: self._arefresh(query, entry))
+        except Exception as e:
+            return self._failed(e, entry, data)
+        return self._pick(entry, data, "STALE" if served_stale else cache_status)
+
+    def _validate(self, data):
+        if not isinstance(data, dict): return None, ({"error": "JSON object required"}, 400, {})
+        if not self.api_key:
+            return None, ({"error": "Image generation service is not configured."}, 500, {})
+        prompt = data.get('prompt')
+        if not prompt or not isinstance(prompt, str): return None, ({"error": "A prompt is required."}, 400, {})
+        return prompt, None
+
+    def _lookup(self, query):
+        """Decides how to answer `query`: HIT/STALE (serve cache), MISS/REFRESH (fetch) or QUOTA."""
+        entry, fresh = self.cache.lookup(query)
+        if entry is not None and fresh: return entry, "HIT"
+        if self._quota_low():
+            return (entry, "STALE") if entry is not None else (None, "QUOTA")
+        return entry, "MISS" if entry is None else "REFRESH"
+
+    def _refresh(self, query, entry):
+        response = self.client.get("/v1/search", params={"query": query, "per_page": self.page_size})
+        return self._store(query, entry, response)
+
+    async def _arefresh(self, query, entry):
+        response = await self.async_client.get("/v1/search", params={"query": query, "per_page": self.page_size})
+        return self._store(query, entry, response)
+
+    def _store(self, query, entry, response):
+        """Caches a search response; returns (entry, served_stale)."""
+        self._record_quota(response.headers)
+        if response.status_code == 429 and entry is not None:
+            return entry, True
+        response.raise_for_status()
+        return self.cache.put(query, response.json().get("photos") or []), False
+
+    def _failed(self, error, entry, data):
+        if entry is not None:
+            print(f"Pexels API Error (serving cached results): {error}")
+            return self._pick(entry, data, "STALE")
+        if isinstance(error, CircuitOpenError):
+            return {"error": str(error)}, 503, {}
+        print(f"Pexels API Error: {error}")
+        return {"error": "Failed to fetch image from Pexels."}, 500, {}
+
+    def _pick(self, entry, data, cache_status):
+        self.cache.record(cache_status)
+        if not entry.results: return {"error": "No images found for that prompt."}, 404, {"X-Cache": cache_status}
+        index = self.cache.advance(entry) if data.get('another') else 0
+        return ({"imageUrl": entry.results[index]["src"]["medium"], "candidates": len(entry.results)},
+                200, {"X-Cache": cache_status})
+
+    def _record_quota(self, headers):
+        remaining, reset = headers.get("X-Ratelimit-Remaining"), headers.get("X-Ratelimit-Reset")
+        with self._quota_lock:
+            if remaining is not None and remaining.isdigit(): self.quota_remaining = int(remaining)
+            if reset is not None and reset.isdigit(): self.quota_reset = int(reset)
+
+    def _quota_low(self):
+        with self._quota_lock:
+            if self.quota_remaining is None or self.quota_remaining > self.quota_reserve:
+                return False
+            # Pexels reports the reset as a UNIX timestamp; once past it, try again.
+            if self.quota_reset is not None and time.time() >= self.quota_reset:
+                self.quota_remaining = None
+                return False
+            return True
+
+    @staticmethod
+    def _quota_exhausted():
+        return {"error": "Image search is temporarily rate limited. Please try again later."}, 503, {}
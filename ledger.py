@@ -0,0 +1,244 @@
+import os
+import re
+import sys
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN
+
+import analytics
+import db
+import metrics
+
+LEGACY_IMPORT_KEY = "legacy_log_imported"
+MAX_PAGE_SIZE = 500
+GWEI_PER_ETH = 10 ** 9
+WEI_PER_GWEI = 10 ** 9
+# Ledger row kinds: a purchase, or an ownership change with no payment.
+SALE, TRANSFER = "sale", "transfer"
+# Optional human-readable copy of every purchase in the old log format. The
+# variable is read on each write, as app.py loads .env after importing this module.
+AUDIT_LOG_ENV = "NOVAMINT_AUDIT_LOG"
+
+# "Jane Doe (jane@example.com)", as the dashboard sends buyer details.
+PARTY_RE = re.compile(r"^(?P<name>.*?)\s*\((?P<email>[^()]*@[^()]*)\)$")
+
+# One entry of the old transactions.log format, as written by record_transaction.
+LEGACY_ENTRY_RE = re.compile(
+    r"^Date: (?P<date>.*?), NFT: (?P<nft>.*?), Price: (?P<price>.*?) ETH, "
+    r"Buyer: (?P<buyer>.*), Seller: (?P<seller>.*)$"
+)
+
+
+def to_gwei(price):
+    """Parses an ETH amount exactly, rounded to whole gwei; None if it is not a valid price.
+
+    Gwei rather than wei because SQLite integers are 64-bit: wei would overflow
+    above ~9.2 ETH, gwei only above ~9.2 billion ETH.
+    """
+    try:
+        amount = Decimal(str(price).strip())
+    except InvalidOperation:
+        return None
+    if not amount.is_finite() or amount < 0:
+        return None
+    return int((amount * GWEI_PER_ETH).quantize(Decimal(1), rounding=ROUND_HALF_EVEN))
+
+
+def split_party(text):
+    """Splits "Name (email)" into (name, email); plain names get email None."""
+    match = PARTY_RE.match(text.strip())
+    return (match["name"], match["email"]) if match else (text.strip(), None)
+
+
+def format_party(name, email=None):
+    return f"{name} ({email})" if email else name
+
+
+def to_iso(timestamp):
+    """Normalizes "YYYY-MM-DD HH:MM:SS" (the old log format) to ISO 8601 "YYYY-MM-DDTHH:MM:SS"."""
+    return timestamp.replace(" ", "T", 1)
+
+
+def append_transaction(nft_name, price, buyer, seller, created_at, nft_id=None, kind=SALE, conn=None):
+    """Appends one ownership change to the ledger and returns its id.
+
+    `buyer` and `seller` are "Name (email)" or plain names; `created_at` is an
+    ISO 8601 local timestamp. `kind` is SALE, which is folded into the
+    analytics, or TRANSFER, which is history only.
+    """
+    price_gwei = to_gwei(price)
+    price_eth = price_gwei / GWEI_PER_ETH if price_gwei is not None else None
+    created_at = to_iso(created_at)
+    (buyer_name, buyer_email), (seller_name, seller_email) = split_party(buyer), split_party(seller)
+    conn = conn or db.get_connection()
+    cursor = conn.execute(
+        """INSERT INTO transactions (created_at, nft_id, nft_name, collection, price, price_eth, price_gwei, buyer,
+                                     buyer_name, buyer_email, seller, seller_name, seller_email, kind)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        (created_at, nft_id, nft_name, analytics.collection_name(nft_name), str(price), price_eth, price_gwei,
+         buyer, buyer_name, buyer_email, seller, seller_name, seller_email, kind),
+    )
+    if kind == SALE:
+        analytics.record_sale(conn, nft_name, price_eth, buyer, seller, created_at)
+    return cursor.lastrowid
+
+
+def write_audit_entry(nft_name, price, buyer, seller, created_at, path=None):
+    """Appends one purchase to the text audit log in the old "Key: value, ..." format, if enabled.
+
+    `path` defaults to $NOVAMINT_AUDIT_LOG. The log is write-only output for
+    people; the ledger database is the record.
+    """
+    path = path or os.getenv(AUDIT_LOG_ENV)
+    if not path:
+        return
+    line = f"Date: {created_at}, NFT: {nft_name}, Price: {price} ETH, Buyer: {buyer}, Seller: {seller}\n"
+    # One write() on an O_APPEND descriptor, so lines from concurrent workers never interleave.
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line.encode("utf-8"))
+    finally:
+        os.close(fd)
+
+
+def to_api(row):
+    """Formats a ledger row: the dashboard's original keys plus the typed fields."""
+    price_gwei = row["price_gwei"]
+    return {
+        "id": row["id"], "nftId": row["nft_id"], "Date": row["created_at"], "NFT": row["nft_name"], "Price": f"{row['price']} ETH",
+        "Buyer": row["buyer"], "Seller": row["seller"],
+        # Wei as a string because it exceeds what JSON numbers hold exactly.
+        "priceWei": str(price_gwei * WEI_PER_GWEI) if price_gwei is not None else None,
+        "buyerName": row["buyer_name"], "buyerEmail": row["buyer_email"],
+        "sellerName": row["seller_name"], "sellerEmail": row["seller_email"], "kind": row["kind"],
+    }
+
+
+def query_transactions(limit=50, cursor=None, nft=None, buyer=None, seller=None,
+                       min_price=None, max_price=None, since=None, until=None):
+    """Returns one newest-first page of transactions and the cursor for the next page.
+
+    `nft` is a collection ("WW II Tanks" finds every edition) or, with an
+    edition number, one NFT; `buyer` and `seller` are party names. `since`/
+    `until` are inclusive ISO 8601 dates or date-times ("YYYY-MM-DD" or
+    "YYYY-MM-DDTHH:MM:SS"). `cursor` is the id of the last row of the previous
+    page.
+
+    Pages always run in id order, so none sorts its matches: the name filters
+    are equalities on (column, id) indexes, `since` becomes a lower id bound
+    (see _first_id_since), and the price bounds and `until` are checked on the
+    rows read.
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    clauses, params = [], []
+    if nft:
+        nft = nft.strip()
+        collection = analytics.collection_name(nft)
+        clauses.append("collection = ?" if collection == nft else "nft_name = ?"); params.append(nft)
+    if buyer:
+        clauses.append("buyer_name = ?"); params.append(buyer.strip())
+    if seller:
+        clauses.append("seller_name = ?"); params.append(seller.strip())
+    # Unary + keeps the planner off the price and created_at indexes, whose order would need a sort.
+    if min_price is not None:
+        clauses.append("+price_eth >= ?"); params.append(float(min_price))
+    if max_price is not None:
+        clauses.append("+price_eth <= ?"); params.append(float(max_price))
+    conn = db.get_connection()
+    if since:
+        since = to_iso(since)
+        clauses.append("id >= ? AND +created_at >= ?"); params.extend([_first_id_since(conn, since), since])
+    if until:
+        # A bare date should include the whole day.
+        clauses.append("+created_at <= ?"); params.append(to_iso(until) if len(until) > 10 else until + "T23:59:59")
+    if cursor is not None:
+        clauses.append("id < ?"); params.append(int(cursor))
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = conn.execute(
+        f"SELECT * FROM transactions {where} ORDER BY id DESC LIMIT ?", params + [limit + 1]
+    ).fetchall()
+    next_cursor = rows[limit - 1]["id"] if len(rows) > limit else None
+    return [to_api(row) for row in rows[:limit]], next_cursor
+
+
+def _first_id_since(conn, since):
+    """The smallest id created at or after `since`, or one past the last id if there is none.
+
+    Read from the covering created_at index, so it costs the rows since
+    `since`, not the whole ledger; ids are not strictly in created_at order
+    (timestamps are taken before the group commit), hence MIN rather than the
+    first row by time.
+    """
+    first_id = conn.execute(
+        "SELECT MIN(id) FROM transactions INDEXED BY idx_transactions_created WHERE created_at >= ?", (since,)
+    ).fetchone()[0]
+    if first_id is None:
+        first_id = (conn.execute("SELECT MAX(id) FROM transactions").fetchone()[0] or 0) + 1
+    return first_id
+
+
+def iter_transactions(since=None, after_id=None, batch_size=1000):
+    """Yields every matching transaction oldest first, reading `batch_size` rows at a time.
+
+    Each batch is its own short query keyed on id, so memory stays flat and no
+    read transaction is held open while a slow client consumes the stream.
+    `since` is an inclusive ISO 8601 date(time) bound; `after_id` resumes
+    an earlier export exactly.
+    """
+    last_id = int(after_id) if after_id is not None else 0
+    conn = db.get_connection()
+    if since:
+        # Start at the first row since `since` instead of filtering a scan from id 0.
+        since = to_iso(since)
+        last_id = max(last_id, _first_id_since(conn, since) - 1)
+    while True:
+        clauses, params = ["id > ?"], [last_id]
+        if since:
+            clauses.append("+created_at >= ?"); params.append(since)
+        rows = conn.execute(
+            f"SELECT * FROM transactions WHERE {' AND '.join(clauses)} ORDER BY id LIMIT ?", params + [batch_size]
+        ).fetchall()
+        for row in rows:
+            yield to_api(row)
+        if len(rows) < batch_size:
+            return
+        last_id = rows[-1]["id"]
+
+
+def parse_legacy_log(text):
+    """Yields the fields of each entry in an old-format transactions.log."""
+    # Old versions wrote a literal backslash-n instead of a newline, so the whole
+    # file is usually one line; accept both separators.
+    for line in text.replace("\\n", "\n").splitlines():
+        match = LEGACY_ENTRY_RE.match(line.strip())
+        if match:
+            yield match.groupdict()
+
+
+def import_legacy_log(path):
+    """One-time import of an old transactions.log; returns the number of entries imported.
+
+    The first call marks the import as done whether or not there was anything
+    to import, so purchases logged since then are never read back in. The
+    audit log shares the legacy line format, so it is never imported from.
+    """
+    if db.get_meta(LEGACY_IMPORT_KEY):
+        return 0
+    audit_log = os.getenv(AUDIT_LOG_ENV)
+    entries = []
+    if os.path.exists(path) and not (audit_log and os.path.abspath(audit_log) == os.path.abspath(path)):
+        with open(path, "r") as f, metrics.stage("legacy_log_parse"):
+            entries = list(parse_legacy_log(f.read()))
+    with db.transaction() as conn:
+        # Re-check under the write lock in case another worker got here first.
+        if conn.execute("SELECT 1 FROM meta WHERE key = ?", (LEGACY_IMPORT_KEY,)).fetchone():
+            return 0
+        for e in entries:
+            append_transaction(e["nft"], e["price"], e["buyer"], e["seller"], e["date"], conn=conn)
+        db.set_meta(LEGACY_IMPORT_KEY, path, conn=conn)
+    return len(entries)
+
+if __name__ == "__main__":
+    # Usage: python ledger.py [transactions.log] [novamint.db]
+    log_path = sys.argv[1] if len(sys.argv) > 1 else "transactions.log"
+    db.init_db(sys.argv[2] if len(sys.argv) > 2 else "novamint.db")
+    analytics.backfill()
+    print(f"Imported {import_legacy_log(log_path)} transaction(s) from {log_path}.")
@@ -0,0 +1,145 @@
+"""In-process metrics exposed in the Prometheus text format (see /metrics in app.py).
+
+Counters and histograms are plain dicts keyed by label values behind one lock
+each, so recording a sample costs a dict lookup and a bisect. Values that other
+components already count (cache hits, coalesced calls, ...) are not duplicated
+on the hot path: collectors registered with `register_collector` read them at
+scrape time. Each process keeps its own metrics.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; spans sub-millisecond stages up to slow upstream calls.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        lines += [f"{self.name}{_labels(self.labelnames, labels)} {value}" for labels, value in values]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [per-bucket counts (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._series.items())
+        for labels, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                bucket_labels = _labels(self.labelnames + ("le",), labels + (_number(bound),))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Counter(name, help_text, tuple(labelnames)))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help_text, tuple(labelnames), buckets))
+
+    def register_collector(self, collect):
+        """Adds a scrape-time source: `collect()` returns (name, type, help, [(labels dict, value), ...]) tuples."""
+        self._collectors.append(collect)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        for collect in self._collectors:
+            for name, metric_type, help_text, samples in collect():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+                lines += [f"{name}{_labels(tuple(labels), tuple(labels.values()))} {value}" for labels, value in samples]
+        return "\n".join(lines) + "\n"
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = (f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    return value if isinstance(value, str) else repr(float(value))
+
+
+registry = Registry()
+requests_total = registry.counter(
+    "novamint_requests_total", "HTTP requests handled, by route, method and status.", ("route", "method", "status"))
+request_seconds = registry.histogram(
+    "novamint_request_duration_seconds", "HTTP request latency by route and method.", ("route", "method"))
+stage_seconds = registry.histogram(
+    "novamint_stage_duration_seconds",
+    "Time spent in each stage of request handling (upstream calls, PDF layout, file writes, ...).", ("stage",))
+
+
+def stage(name):
+    """Times the enclosed block as stage `name`: `with metrics.stage("pdf_layout"): ...`."""
+    return stage_seconds.time(name)
+
+
+def observe_stage(name, seconds):
+    stage_seconds.observe(seconds, name)
+
+
+def observe_request(route, method, status, seconds):
+    requests_total.inc(route, method, str(status))
+    request_seconds.observe(seconds, route, method)
@@ -0,0 +1,126 @@
+import cProfile
+import functools
+import hmac
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from flask import g, jsonify, make_response, request
+
+MODES = ("cprofile", "sample")
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval into folded stacks.
+
+    The output is the "collapsed" format (`outer;inner;leaf count` per line)
+    read by flamegraph.pl, speedscope and inferno. Sampling runs on its own
+    thread, so the effective rate is bounded by the interpreter's switch
+    interval (5 ms by default) while the profiled thread holds the GIL.
+    """
+
+    def __init__(self, thread_id, interval=0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+
+class RequestProfiler:
+    """Profiles single requests on demand and saves the result under `directory`.
+
+    A request opts in with `?profile=<mode>` or an `X-Profile: <mode>` header,
+    where mode is "cprofile" (deterministic; a .prof file for snakeviz or
+    flameprof) or "sample" (a .folded flame-graph file). It is honoured when
+    profiling is `enabled` for everyone, or when the request carries
+    `X-Profile-Token` matching `token`; otherwise the request gets 403. Only
+    views wrapped with `profiled` can be profiled, and only the request thread
+    is covered, not work handed to the PDF worker pool; views check `active()`
+    to run work inline that they would otherwise hand to another thread.
+
+    Only one request at a time can be under cProfile (Python 3.12+ refuses a
+    second active profiler), so an overlapping "cprofile" request is sampled
+    instead; `X-Profile-Mode` on the response says which mode ran.
+    """
+
+    def __init__(self, directory, enabled=False, token=None, interval=0.001):
+        self.directory = directory
+        self.enabled = enabled
+        self.token = token
+        self.interval = interval
+        self._cprofile_lock = threading.Lock()
+
+    @staticmethod
+    def active():
+        """True while the current request is being profiled."""
+        return g.get('profiling', False)
+
+    def profiled(self, view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            mode = request.args.get('profile') or request.headers.get('X-Profile')
+            if not mode:
+                return view(*args, **kwargs)
+            if mode not in MODES:
+                return jsonify({"error": f"profile must be one of {', '.join(MODES)}."}), 400
+            if not self._allowed():
+                return jsonify({"error": "Profiling is not enabled for this request."}), 403
+            os.makedirs(self.directory, exist_ok=True)
+            name = f"{view.__name__}_{time.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
+            if mode == "cprofile" and not self._cprofile_lock.acquire(blocking=False):
+                mode = "sample"
+            g.profiling = True
+            if mode == "cprofile":
+                try:
+                    profile = cProfile.Profile()
+                    response = make_response(profile.runcall(view, *args, **kwargs))
+                    path = os.path.join(self.directory, f"{name}.prof")
+                    profile.dump_stats(path)
+                finally:
+                    self._cprofile_lock.release()
+            else:
+                sampler = StackSampler(threading.get_ident(), self.interval)
+                sampler.start()
+                try:
+                    response = make_response(view(*args, **kwargs))
+                finally:
+                    sampler.stop()
+                path = os.path.join(self.directory, f"{name}.folded")
+                sampler.write(path)
+            response.headers['X-Profile-File'] = path
+            response.headers['X-Profile-Mode'] = mode
+            return response
+        return wrapper
+
+    def _allowed(self):
+        if self.enabled:
+            return True
+        supplied = request.headers.get('X-Profile-Token', '')
+        return bool(self.token) and hmac.compare_digest(supplied.encode(), self.token.encode())
@@ -0,0 +1,151 @@
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+import db
+import documents
+import metrics
+
+# A claimed job not finished within this many seconds is assumed lost with its
+# process and may be claimed again. Rendering one receipt takes milliseconds.
+DEFAULT_LEASE_SECONDS = 300
+
+
+class ReceiptQueue:
+    """Durable queue of receipt PDFs rendered by a pool of worker processes.
+
+    Jobs are rows in the `receipts` table, inserted in the same database
+    transaction as the purchase they belong to, so a job is never lost even if
+    the server stops before it is rendered: `recover()` resubmits anything still
+    pending at startup. FPDF layout is pure Python, hence processes, not threads.
+
+    Several server processes share the table, so a job is claimed (pending ->
+    running) with a conditional UPDATE before it is rendered and exactly one
+    process wins it. Claims expire after `lease` seconds; `resume()` (called
+    when a client polls the receipt) and `recover()` pick up jobs whose process
+    died mid-render.
+
+    If a worker dies the pool breaks; with `make_executor` the queue replaces
+    it and puts the jobs it lost back to pending instead of failing them.
+    """
+
+    def __init__(self, output_dir, executor, lease=DEFAULT_LEASE_SECONDS, make_executor=None):
+        self.output_dir = output_dir
+        self.executor = executor
+        self.lease = lease
+        self.make_executor = make_executor
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = threading.Lock()
+
+    def enqueue(self, conn, transaction_id, fields, stamp):
+        """Records a pending job inside the caller's transaction; returns (receipt id, filename).
+
+        Call `submit()` with the id, filename and fields once that transaction commits.
+        """
+        receipt_id = uuid.uuid4().hex
+        filename = documents.receipt_filename(fields["item"], stamp, receipt_id)
+        conn.execute(
+            "INSERT INTO receipts (id, transaction_id, filename, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+            (receipt_id, transaction_id, filename, json.dumps(fields), datetime.now().isoformat(timespec='seconds')),
+        )
+        return receipt_id, filename
+
+    def submit(self, receipt_id, filename, fields):
+        """Renders the job in the pool if this process wins its claim; returns whether it did.
+
+        If the pool cannot take the job even after being replaced, the claim is
+        released so the job stays pending, and the error is raised.
+        """
+        if not self._claim(receipt_id):
+            return False
+        path = os.path.join(self.output_dir, filename)
+        executor = self.executor
+        try:
+            try:
+                future = executor.submit(documents.render_receipt, path, fields)
+            except BrokenProcessPool as e:
+                executor = self._replace_executor(executor, e)
+                future = executor.submit(documents.render_receipt, path, fields)
+        except BaseException:
+            self._release(receipt_id)
+            raise
+        future.add_done_callback(lambda f: self._finished(receipt_id, f, executor))
+        return True
+
+    def resume(self, receipt):
+        """Resubmits `receipt` (a `get()` result) if it is pending or its claim expired; returns whether it did."""
+        expired = receipt["status"] == "running" and receipt["claimed_at"] < time.time() - self.lease
+        if receipt["status"] != "pending" and not expired:
+            return False
+        row = db.get_connection().execute("SELECT payload FROM receipts WHERE id = ?", (receipt["id"],)).fetchone()
+        return self.submit(receipt["id"], receipt["filename"], json.loads(row["payload"]))
+
+    def recover(self):
+        """Resubmits every job left pending, or claimed by a process that did not finish it; returns how many."""
+        rows = db.get_connection().execute(
+            "SELECT id, filename, payload FROM receipts WHERE status = 'pending' OR (status = 'running' AND claimed_at < ?)",
+            (time.time() - self.lease,),
+        ).fetchall()
+        return sum(self.submit(row["id"], row["filename"], json.loads(row["payload"])) for row in rows)
+
+    def get(self, receipt_id):
+        row = db.get_connection().execute(
+            "SELECT id, filename, status, error, claimed_at FROM receipts WHERE id = ?", (receipt_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def path(self, receipt):
+        return os.path.join(self.output_dir, receipt["filename"])
+
+    def _claim(self, receipt_id):
+        now = time.time()
+        cursor = db.get_connection().execute(
+            """UPDATE receipts SET status = 'running', claimed_by = ?, claimed_at = ?
+               WHERE id = ? AND (status = 'pending' OR (status = 'running' AND claimed_at < ?))""",
+            (self.owner, now, receipt_id, now - self.lease),
+        )
+        return cursor.rowcount == 1
+
+    def _release(self, receipt_id):
+        db.get_connection().execute(
+            "UPDATE receipts SET status = 'pending', claimed_by = NULL, claimed_at = NULL WHERE id = ? AND claimed_by = ?",
+            (receipt_id, self.owner),
+        )
+
+    def _replace_executor(self, broken, error):
+        """Swaps in a new pool for `broken` (once, however many jobs saw it break); returns the current pool."""
+        if self.make_executor is None:
+            raise error
+        with self._lock:
+            if self.executor is broken:
+                print(f"Receipt pool broken, starting a new one: {error}")
+                self.executor = self.make_executor()
+                broken.shutdown(wait=False)
+            return self.executor
+
+    def _finished(self, receipt_id, future, executor=None):
+        if future.cancelled():
+            # The pool shut down first; the claim expires and a later recover() renders it.
+            return
+        error = future.exception()
+        if isinstance(error, BrokenProcessPool) and self.make_executor is not None:
+            # A worker died; back to pending for resume()/recover() on the replacement pool.
+            self._replace_executor(executor, error)
+            self._release(receipt_id)
+            return
+        if error:
+            print(f"Receipt Generation Error: {error}")
+        else:
+            for stage, seconds in future.result().items():
+                metrics.observe_stage(stage, seconds)
+        with db.transaction() as conn:
+            conn.execute(
+                "UPDATE receipts SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                ("failed" if error else "done", str(error) if error else None,
+                 datetime.now().isoformat(timespec='seconds'), receipt_id),
+            )
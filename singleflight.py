@@ -0,0 +1,82 @@
+import asyncio
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one execution.
+
+    The first caller for a key (the leader) runs the function; callers arriving
+    while it is in flight wait and receive the same result or exception, so the
+    result must not be mutated by callers. Keys are tuples whose first element
+    names the upstream; counters of originated vs. coalesced calls are kept per
+    upstream. `do` is for threads and `ado` for coroutines; they track in-flight
+    calls separately but share counters.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._async_calls = {}
+        self._counters = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            self._count(key, leader)
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key, fn):
+        """Like `do`, for a zero-argument function returning an awaitable.
+
+        The shared call runs in its own task and every caller, the leader
+        included, awaits it through `asyncio.shield`, so a caller that is
+        cancelled (say its client disconnected) never cancels it for the rest.
+        """
+        with self._lock:
+            task = self._async_calls.get(key)
+            leader = task is None
+            if leader:
+                task = self._async_calls[key] = asyncio.ensure_future(self._arun(key, fn))
+                # Retrieve the outcome even if every caller was cancelled, so it is never reported as lost.
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._count(key, leader)
+        return await asyncio.shield(task)
+
+    async def _arun(self, key, fn):
+        try:
+            return await fn()
+        finally:
+            with self._lock:
+                del self._async_calls[key]
+
+    def stats(self):
+        with self._lock:
+            return {name: dict(counts) for name, counts in self._counters.items()}
+
+    def _count(self, key, leader):
+        counts = self._counters.setdefault(key[0], {"originated": 0, "coalesced": 0})
+        counts["originated" if leader else "coalesced"] += 1
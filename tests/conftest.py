@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+
+@pytest.fixture
+def database(tmp_path):
+    """A fresh, fully migrated database for one test."""
+    db.init_db(str(tmp_path / "novamint.db"))
+    return db
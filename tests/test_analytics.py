@@ -0,0 +1,71 @@
+import pytest
+
+import analytics
+import ledger
+
+
+def _sell(conn, name, price, buyer="Bob (bob@example.com)", seller="Alice (alice@example.com)"):
+    ledger.append_transaction(name, price, buyer, seller, "2025-06-11T16:21:25", conn=conn)
+
+
+def test_market_summary_totals_follow_every_sale(database):
+    with database.transaction() as conn:
+        _sell(conn, "Beach sunset #1", "1.5")
+        _sell(conn, "Beach sunset #2", "2.5")
+        _sell(conn, "WW II Tanks #1", "0.1")
+
+    summary = analytics.market_summary()
+    assert (summary["sales"], summary["volume"], summary["collections"]) == (3, 4.1, 2)
+    assert summary["topCollections"][0]["collection"] == "Beach sunset"
+    assert summary["topCollections"][0]["medianPrice"] == 2.0
+
+
+def test_backfill_builds_the_same_totals(database):
+    conn = database.get_connection()
+    with database.transaction(conn):
+        _sell(conn, "Beach sunset #1", "1.5")
+        _sell(conn, "WW II Tanks #1", "0.5")
+    expected = analytics.market_summary()
+    with database.transaction(conn):
+        for table in ("collection_stats", "collection_prices", "party_daily", "party_totals"):
+            conn.execute(f"DELETE FROM {table}")
+        conn.execute("UPDATE market_totals SET sale_count = 0, volume_eth = 0, collections = 0")
+        conn.execute("DELETE FROM meta WHERE key = ?", (analytics.BACKFILL_KEY,))
+
+    assert analytics.backfill() == 2
+    assert analytics.market_summary() == expected
+
+
+def test_all_time_top_parties_come_from_the_totals(database):
+    with database.transaction() as conn:
+        _sell(conn, "Beach sunset #1", "1.5")
+        _sell(conn, "Beach sunset #2", "2.5", buyer="Carol")
+        ledger.append_transaction("WW II Tanks #1", "0.1", "Carol", "Alice (alice@example.com)",
+                                  "2024-01-01T10:00:00", conn=conn)
+
+    assert analytics.top_parties("buyer", "all") == [
+        {"party": "Carol", "sales": 2, "volume": 2.6},
+        {"party": "Bob (bob@example.com)", "sales": 1, "volume": 1.5},
+    ]
+    plan = database.get_connection().execute(
+        "EXPLAIN QUERY PLAN SELECT party FROM party_totals WHERE role = 'buyer' ORDER BY volume_eth DESC LIMIT 10"
+    ).fetchall()
+    assert not any("TEMP B-TREE" in row[3] for row in plan)
+
+
+def test_transfers_are_history_but_not_sales(database):
+    with database.transaction() as conn:
+        _sell(conn, "Beach sunset #1", "1.5")
+        ledger.append_transaction("Beach sunset #1", "0", "Carol", "Bob (bob@example.com)", "2025-06-12T09:00:00",
+                                  kind=ledger.TRANSFER, conn=conn)
+
+    assert [tx["kind"] for tx in ledger.query_transactions()[0]] == ["transfer", "sale"]
+    summary = analytics.market_summary()
+    assert (summary["sales"], summary["volume"]) == (1, 1.5)
+    assert analytics.collection_stats("Beach sunset")["floorPrice"] == 1.5
+    assert analytics.top_parties("buyer", "all") == [{"party": "Bob (bob@example.com)", "sales": 1, "volume": 1.5}]
+
+
+def test_bad_limit_gets_a_fixed_message(database):
+    with pytest.raises(ValueError, match=r"^limit must be an integer\.$"):
+        analytics.top_parties("buyer", "all", limit="ten")
@@ -0,0 +1,58 @@
+import threading
+import time
+
+import pytest
+
+import catalog
+
+
+def test_transfer_is_a_compare_and_swap(database):
+    nft = catalog.create_nft("Beach sunset", 1, "alice")
+    sold = catalog.transfer_nft(nft["id"], "bob", expected_version=nft["version"], expected_owner="alice")
+    assert sold["currentOwner"] == "bob" and sold["version"] == nft["version"] + 1
+
+    with pytest.raises(catalog.TransferConflict) as conflict:
+        catalog.transfer_nft(nft["id"], "carol", expected_version=nft["version"])
+    assert conflict.value.nft["currentOwner"] == "bob"
+    with pytest.raises(catalog.TransferConflict):
+        catalog.transfer_nft(nft["id"], "carol", expected_version=sold["version"], expected_owner="alice")
+    assert catalog.transfer_nft("nft-missing", "carol", expected_version=0) is None
+
+
+def test_concurrent_buyers_exactly_one_wins(database):
+    nft = catalog.create_nft("Beach sunset", 1, "alice")
+    results, barrier = [], threading.Barrier(8)
+
+    def buy(buyer):
+        barrier.wait()
+        try:
+            with database.transaction() as conn:
+                catalog.transfer_nft(nft["id"], buyer, expected_version=nft["version"], conn=conn)
+            results.append(buyer)
+        except catalog.TransferConflict:
+            results.append(None)
+
+    threads = [threading.Thread(target=buy, args=(f"buyer{i}",)) for i in range(8)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+
+    winners = [buyer for buyer in results if buyer]
+    assert len(results) == 8 and len(winners) == 1
+    assert catalog.get_nft(nft["id"])["currentOwner"] == winners[0]
+
+
+def test_expired_listing_cannot_be_bought(database):
+    nft = catalog.create_nft("Beach sunset", 1, "alice", listing_minutes=1)
+    assert nft["expiresAt"] == nft["timestamp"] + 60000
+    with pytest.raises(catalog.ListingExpired):
+        catalog.transfer_nft(nft["id"], "bob", expected_version=nft["version"], listed_at=nft["expiresAt"])
+    assert catalog.get_nft(nft["id"])["currentOwner"] == "alice"
+
+    sold = catalog.transfer_nft(nft["id"], "bob", expected_version=nft["version"], listed_at=int(time.time() * 1000))
+    assert sold["currentOwner"] == "bob"
+
+
+@pytest.mark.parametrize("quantity", ["ten", "1.5", "", "0", "10001"])
+def test_bad_edition_quantity_gets_a_fixed_message(database, quantity):
+    with pytest.raises(ValueError, match=r"^quantity must be an integer between 1 and 10000\.$"):
+        catalog.create_editions("Drop", "1", "Alice", quantity)
@@ -0,0 +1,26 @@
+import pytest
+
+import contracts
+
+
+@pytest.mark.parametrize("args", [
+    (["upload"], "Beach sunset"),
+    ("upload", 123),
+    ("upload", "Beach sunset", 7),
+    ("upload", "Beach sunset", "", 123),
+    ("upload", "Beach sunset", "", None, 1e400),
+    ("upload", "Beach sunset", "", None, "1e400"),
+    ("upload", "Beach sunset", "", None, float("nan")),
+    ("upload", "Beach sunset", "", None, True),
+    ("upload", "Beach sunset", "", None, -1),
+    ("upload", "Beach sunset", "", None, [1]),
+])
+def test_bad_parameters_raise_value_error(args):
+    with pytest.raises(ValueError):
+        contracts.generate(*args)
+
+
+def test_same_timestamp_gives_identical_source():
+    first = contracts.generate("mint", " Beach sunset ", "sunset.png", "Waves\nand sand", 1700000000)
+    assert first == contracts.generate("mint", "Beach sunset", "sunset.png", "Waves\nand sand", "1700000000")
+    assert "contract Beachsunset is" in first and "creationTimestamp = 1700000000;" in first
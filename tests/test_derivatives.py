@@ -0,0 +1,43 @@
+from concurrent.futures import Future
+
+import pytest
+
+import derivatives
+
+pytestmark = pytest.mark.skipif(derivatives.Image is None, reason="needs Pillow")
+
+
+class FailingExecutor:
+    """Fails every job with the next queued error, or cancels it for None."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def submit(self, fn, *args):
+        self.calls += 1
+        future = Future()
+        error = self.errors.pop(0)
+        if error is None:
+            future.cancel()
+        else:
+            future.set_exception(error)
+        return future
+
+
+class Assets:
+    def path(self, asset_id):
+        return f"/nonexistent/{asset_id}"
+
+
+def test_only_unreadable_images_are_given_up_on(tmp_path):
+    executor = FailingExecutor(OSError("No space left on device"), None,
+                               derivatives.Image.UnidentifiedImageError("not an image"))
+    store = derivatives.DerivativeStore(str(tmp_path), Assets(), executor)
+
+    assert store.get("abc123.png", "thumb") is None
+    assert store.get("abc123.png", "thumb") is None
+    assert "abc123" not in store.failed
+    assert store.get("abc123.png", "thumb") is None
+    assert "abc123" in store.failed
+    assert store.submit("abc123.png") is None and executor.calls == 3
@@ -0,0 +1,36 @@
+import textwrap
+import zipfile
+
+import pytest
+
+import files
+
+TREE = {
+    "novamint/app.py": "\n    print('hello')\n" * 200,
+    "novamint/naïve.txt": "ünïcode " * 100,
+    "novamint/static/style.css": "body { color: red; }\n" * 50,
+}
+
+
+@pytest.mark.parametrize("compression", ["deflate", "store", "bzip2", "lzma"])
+def test_archives_read_back_with_zipfile(tmp_path, compression):
+    path = str(tmp_path / "bundle.zip")
+    assert files.create_project_zip(path, TREE, compression, workers=2) == (3, 0)
+    edited = dict(TREE, **{"novamint/app.py": TREE["novamint/app.py"] + "x = 1\n"})
+    assert files.create_project_zip(path, edited, compression, workers=1) == (1, 2)
+
+    with zipfile.ZipFile(path) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == sorted(edited)
+        for name, content in edited.items():
+            assert archive.read(name).decode() == textwrap.dedent(content).strip()
+            info = archive.getinfo(name)
+            assert info.date_time == files.DEFAULT_DATE_TIME and info.external_attr == files.MEMBER_ATTRIBUTES
+
+
+def test_rebuilds_are_byte_identical(tmp_path):
+    first, second = str(tmp_path / "a.zip"), str(tmp_path / "b.zip")
+    files.create_project_zip(first, TREE, workers=1)
+    files.create_project_zip(second, TREE, workers=4)
+    with open(first, "rb") as a, open(second, "rb") as b:
+        assert a.read() == b.read()
@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+
+from group_commit import GroupCommitWriter, WriterStopped
+
+
+def _put(key):
+    def write(conn):
+        conn.execute("INSERT INTO meta (key, value) VALUES (?, 'x')", (key,))
+        return key
+    return write
+
+
+def _keys(database):
+    return {row[0] for row in database.get_connection().execute("SELECT key FROM meta WHERE value = 'x'")}
+
+
+def test_concurrent_writes_share_commits(database):
+    writer = GroupCommitWriter(max_wait=0.05)
+    start = threading.Barrier(32)
+    results = []
+
+    def worker(i):
+        start.wait()
+        results.append(writer.run(_put(f"k{i}")))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(32)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == sorted(f"k{i}" for i in range(32))
+    assert _keys(database) == set(results)
+    stats = writer.stats()
+    assert stats["writes"] == 32 and stats["batches"] < 32
+
+
+def test_failing_write_is_rolled_back_alone(database):
+    writer = GroupCommitWriter(max_wait=0.05)
+
+    def fails(conn):
+        conn.execute("INSERT INTO meta (key, value) VALUES ('bad', 'x')")
+        raise ValueError("rejected")
+
+    errors = []
+
+    def run(fn):
+        try:
+            writer.run(fn)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(fn,)) for fn in (_put("a"), fails, _put("b"))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 1
+    assert _keys(database) == {"a", "b"}
+
+
+def test_dead_writer_fails_its_callers_and_restarts(database):
+    writer = GroupCommitWriter()
+
+    def kills_thread(conn):
+        conn.execute("INSERT INTO meta (key, value) VALUES ('lost', 'x')")
+        raise SystemExit
+
+    with pytest.raises(WriterStopped):
+        writer.run(kills_thread)
+    assert writer.run(_put("after")) == "after"
+    assert _keys(database) == {"after"}
+
+
+def test_inline_write_commits_on_the_calling_thread(database):
+    writer = GroupCommitWriter()
+    caller = threading.get_ident()
+    assert writer.run(lambda conn: threading.get_ident(), inline=True) == caller
+    assert writer.run(lambda conn: threading.get_ident()) != caller
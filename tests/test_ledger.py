@@ -0,0 +1,78 @@
+import pytest
+
+import ledger
+
+
+def test_audit_log_path_is_read_when_writing(tmp_path, monkeypatch):
+    # app.py imports ledger before load_dotenv(), so the path cannot be fixed at import.
+    log = tmp_path / "transactions.log"
+    monkeypatch.delenv(ledger.AUDIT_LOG_ENV, raising=False)
+    ledger.write_audit_entry("Beach sunset #1", "1.5", "Bob", "Alice", "2025-06-11T16:21:25")
+    assert not log.exists()
+
+    monkeypatch.setenv(ledger.AUDIT_LOG_ENV, str(log))
+    ledger.write_audit_entry("Beach sunset #1", "1.5", "Bob", "Alice", "2025-06-11T16:21:25")
+    assert log.read_text() == (
+        "Date: 2025-06-11T16:21:25, NFT: Beach sunset #1, Price: 1.5 ETH, Buyer: Bob, Seller: Alice\n"
+    )
+
+
+def test_legacy_import_runs_once_even_without_a_log(database, tmp_path):
+    log = tmp_path / "transactions.log"
+    assert ledger.import_legacy_log(str(log)) == 0
+    log.write_text("Date: 2025-06-11T16:21:25, NFT: Beach sunset #1, Price: 1.5 ETH, Buyer: Bob, Seller: Alice\n")
+    assert ledger.import_legacy_log(str(log)) == 0
+    assert ledger.query_transactions()[0] == []
+
+
+def test_audit_log_is_never_imported_as_a_legacy_log(database, tmp_path, monkeypatch):
+    log = tmp_path / "transactions.log"
+    monkeypatch.setenv(ledger.AUDIT_LOG_ENV, str(log))
+    ledger.write_audit_entry("Beach sunset #1", "1.5", "Bob", "Alice", "2025-06-11T16:21:25")
+    assert ledger.import_legacy_log(str(log)) == 0
+    assert ledger.query_transactions()[0] == []
+
+
+def _ledger(database):
+    with database.transaction() as conn:
+        for i, (nft, price, buyer, day) in enumerate([
+            ("Beach sunset #1", "1.5", "Bob (bob@example.com)", "2025-06-01"),
+            ("WW II Tanks #1", "0.2", "Carol", "2025-06-02"),
+            ("Beach sunset #2", "3", "Carol", "2025-06-03"),
+            ("Beach sunset #3", "0.5", "Bob (bob@example.com)", "2025-06-04"),
+        ]):
+            ledger.append_transaction(nft, price, buyer, "Alice", f"{day}T12:00:00", conn=conn)
+
+
+@pytest.mark.parametrize("filters, expected", [
+    ({}, ["Beach sunset #3", "Beach sunset #2", "WW II Tanks #1", "Beach sunset #1"]),
+    ({"nft": "Beach sunset"}, ["Beach sunset #3", "Beach sunset #2", "Beach sunset #1"]),
+    ({"nft": "Beach sunset #2"}, ["Beach sunset #2"]),
+    ({"buyer": "Bob"}, ["Beach sunset #3", "Beach sunset #1"]),
+    ({"min_price": "0.4", "max_price": "2"}, ["Beach sunset #3", "Beach sunset #1"]),
+    ({"since": "2025-06-02", "until": "2025-06-03"}, ["Beach sunset #2", "WW II Tanks #1"]),
+    ({"since": "2025-07-01"}, []),
+])
+def test_filtered_pages_are_newest_first(database, filters, expected):
+    _ledger(database)
+    page, _ = ledger.query_transactions(**filters)
+    assert [tx["NFT"] for tx in page] == expected
+
+
+def test_cursor_walks_every_page(database):
+    _ledger(database)
+    names, cursor = [], None
+    while True:
+        page, cursor = ledger.query_transactions(limit=1, cursor=cursor, nft="Beach sunset")
+        names += [tx["NFT"] for tx in page]
+        if cursor is None:
+            break
+    assert names == ["Beach sunset #3", "Beach sunset #2", "Beach sunset #1"]
+
+
+def test_export_since_starts_at_the_first_matching_id(database):
+    _ledger(database)
+    assert [tx["NFT"] for tx in ledger.iter_transactions(since="2025-06-03", batch_size=1)] == [
+        "Beach sunset #2", "Beach sunset #3"]
+    assert [tx["id"] for tx in ledger.iter_transactions(since="2025-06-01", after_id=3)] == [4]
+    assert list(ledger.iter_transactions(since="2025-07-01")) == []
@@ -0,0 +1,162 @@
+import json
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import documents
+import ledger
+from receipt_queue import ReceiptQueue
+
+
+class InlineExecutor:
+    """Runs each job immediately on the calling thread and remembers what ran."""
+
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, fn, *args):
+        self.calls.append(args)
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+FIELDS = {"item": "Beach sunset #1", "price": "1.50", "seller": "Alice", "buyer": "Bob (bob@example.com)",
+          "date": "2025-06-11 16:21:25"}
+
+
+def _enqueue(database, queue, fields=FIELDS):
+    with database.transaction() as conn:
+        transaction_id = ledger.append_transaction(fields["item"], fields["price"], fields["buyer"], fields["seller"],
+                                                   "2025-06-11T16:21:25", conn=conn)
+        return queue.enqueue(conn, transaction_id, fields, "20250611162125")
+
+
+def test_submitted_job_is_rendered_once(database, tmp_path):
+    executor = InlineExecutor()
+    queue = ReceiptQueue(str(tmp_path), executor)
+    receipt_id, filename = _enqueue(database, queue)
+
+    assert queue.submit(receipt_id, filename, FIELDS)
+    assert not queue.submit(receipt_id, filename, FIELDS)
+    assert queue.recover() == 0
+    assert len(executor.calls) == 1
+    assert queue.get(receipt_id)["status"] == "done"
+    assert (tmp_path / filename).exists()
+
+
+def test_concurrent_recovery_claims_each_job_once(database, tmp_path):
+    first, second = InlineExecutor(), InlineExecutor()
+    queues = [ReceiptQueue(str(tmp_path), first), ReceiptQueue(str(tmp_path), second)]
+    queues[1].owner = "other-host:1"
+    for _ in range(5):
+        _enqueue(database, queues[0])
+
+    assert queues[0].recover() + queues[1].recover() == 5
+    assert len(first.calls) + len(second.calls) == 5
+
+
+def test_recover_reclaims_only_expired_claims(database, tmp_path):
+    executor = InlineExecutor()
+    queue = ReceiptQueue(str(tmp_path), executor, lease=60)
+    stale_id, _ = _enqueue(database, queue)
+    live_id, _ = _enqueue(database, queue)
+    conn = database.get_connection()
+    conn.execute("UPDATE receipts SET status = 'running', claimed_by = 'dead:1', claimed_at = ? WHERE id = ?",
+                 (time.time() - 120, stale_id))
+    conn.execute("UPDATE receipts SET status = 'running', claimed_by = 'live:1', claimed_at = ? WHERE id = ?",
+                 (time.time(), live_id))
+
+    assert queue.recover() == 1
+    assert queue.get(stale_id)["status"] == "done"
+    assert queue.get(live_id)["status"] == "running"
+
+
+def test_failed_render_is_recorded(database, tmp_path):
+    queue = ReceiptQueue(str(tmp_path / "missing-dir"), InlineExecutor())
+    receipt_id, filename = _enqueue(database, queue)
+    queue.submit(receipt_id, filename, FIELDS)
+    assert queue.get(receipt_id)["status"] == "failed"
+
+
+def test_receipt_filenames_are_safe_and_unique(database, tmp_path):
+    queue = ReceiptQueue(str(tmp_path), InlineExecutor())
+    fields = dict(FIELDS, item="../AC/DC: Live")
+    names = {_enqueue(database, queue, fields)[1] for _ in range(2)}
+    assert len(names) == 2
+    for name in names:
+        assert "/" not in name and ":" not in name
+        assert name.startswith("receipt_ACDC_Live_20250611162125_")
+    row = database.get_connection().execute("SELECT payload FROM receipts LIMIT 1").fetchone()
+    assert json.loads(row["payload"])["item"] == "../AC/DC: Live"
+    assert documents.receipt_filename("A b", "1") == "receipt_A_b_1.pdf"
+
+
+class BrokenExecutor:
+    """A pool whose workers have died: submit() raises, like a broken ProcessPoolExecutor."""
+
+    def __init__(self):
+        self.shut_down = False
+
+    def submit(self, fn, *args):
+        raise BrokenProcessPool("a worker died")
+
+    def shutdown(self, wait=True):
+        self.shut_down = True
+
+
+def test_broken_pool_is_replaced_on_submit(database, tmp_path):
+    broken, replacement = BrokenExecutor(), InlineExecutor()
+    queue = ReceiptQueue(str(tmp_path), broken, make_executor=lambda: replacement)
+    receipt_id, filename = _enqueue(database, queue)
+
+    assert queue.submit(receipt_id, filename, FIELDS)
+    assert broken.shut_down and queue.executor is replacement
+    assert queue.get(receipt_id)["status"] == "done"
+
+
+def test_unusable_pool_leaves_the_job_pending(database, tmp_path):
+    queue = ReceiptQueue(str(tmp_path), BrokenExecutor())
+    receipt_id, filename = _enqueue(database, queue)
+
+    with pytest.raises(BrokenProcessPool):
+        queue.submit(receipt_id, filename, FIELDS)
+    assert queue.get(receipt_id)["status"] == "pending"
+    queue.executor = InlineExecutor()
+    assert queue.resume(queue.get(receipt_id))
+    assert queue.get(receipt_id)["status"] == "done"
+
+
+def test_job_lost_with_a_worker_goes_back_to_pending(database, tmp_path):
+    class DyingExecutor(InlineExecutor):
+        def submit(self, fn, *args):
+            future = Future()
+            future.set_exception(BrokenProcessPool("worker exited"))
+            return future
+
+        def shutdown(self, wait=True):
+            pass
+
+    queue = ReceiptQueue(str(tmp_path), DyingExecutor(), make_executor=InlineExecutor)
+    receipt_id, filename = _enqueue(database, queue)
+    queue.submit(receipt_id, filename, FIELDS)
+    assert queue.get(receipt_id)["status"] == "pending"
+    assert queue.resume(queue.get(receipt_id))
+    assert queue.get(receipt_id)["status"] == "done"
+
+
+def test_resume_skips_live_claims_and_takes_expired_ones(database, tmp_path):
+    queue = ReceiptQueue(str(tmp_path), InlineExecutor(), lease=60)
+    receipt_id, _ = _enqueue(database, queue)
+    conn = database.get_connection()
+    conn.execute("UPDATE receipts SET status = 'running', claimed_by = 'dead:1', claimed_at = ? WHERE id = ?",
+                 (time.time(), receipt_id))
+    assert not queue.resume(queue.get(receipt_id))
+    conn.execute("UPDATE receipts SET claimed_at = ? WHERE id = ?", (time.time() - 120, receipt_id))
+    assert queue.resume(queue.get(receipt_id))
+    assert queue.get(receipt_id)["status"] == "done"
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_threads_share_one_call():
+    flights, calls, results = SingleFlight(), [], []
+    release = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return "image"
+
+    threads = [threading.Thread(target=lambda: results.append(flights.do(("stability", "k"), fetch))) for _ in range(5)]
+    for thread in threads: thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads: thread.join()
+
+    assert calls == [1] and results == ["image"] * 5
+    assert flights.stats() == {"stability": {"originated": 1, "coalesced": 4}}
+
+
+def test_error_reaches_every_waiter_and_the_key_is_released():
+    flights = SingleFlight()
+
+    def fail():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError):
+        flights.do(("pexels", "k"), fail)
+    assert flights.do(("pexels", "k"), lambda: "ok") == "ok"
+
+
+def test_async_waiters_share_one_call():
+    async def scenario():
+        flights, calls = SingleFlight(), []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "image"
+
+        results = await asyncio.gather(*(flights.ado(("stability", "k"), fetch) for _ in range(5)))
+        return calls, results, flights.stats()
+
+    calls, results, stats = asyncio.run(scenario())
+    assert calls == [1] and results == ["image"] * 5
+    assert stats == {"stability": {"originated": 1, "coalesced": 4}}
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    async def scenario():
+        flights = SingleFlight()
+        finished = asyncio.Event()
+
+        async def fetch():
+            await asyncio.sleep(0.05)
+            finished.set()
+            return "image"
+
+        leader = asyncio.ensure_future(flights.ado(("stability", "k"), fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.ado(("stability", "k"), fetch))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        result = await follower
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return result, finished.is_set()
+
+    assert asyncio.run(scenario()) == ("image", True)
+
+
+def test_async_error_reaches_every_waiter():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        results = await asyncio.gather(*(flights.ado(("pexels", "k"), fail) for _ in range(3)), return_exceptions=True)
+        return results, await flights.ado(("pexels", "k"), lambda: asyncio.sleep(0, "ok"))
+
+    results, retry = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results) and retry == "ok"
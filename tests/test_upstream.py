@@ -0,0 +1,156 @@
+import asyncio
+
+import httpx
+import pytest
+import requests
+
+from upstream import CircuitBreaker, CircuitOpenError, UpstreamClient
+
+
+class FakeSession:
+    """Stands in for requests.Session: each call pops the next outcome (a status code or an exception)."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        response = requests.Response()
+        response.status_code = outcome
+        return response
+
+
+def _client(*outcomes, retries=2, breaker=None):
+    client = UpstreamClient("Test", "http://upstream.invalid", retries=retries, backoff=0, breaker=breaker)
+    client.session = FakeSession(*outcomes)
+    return client
+
+
+def _open_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == "half-open"
+    return breaker
+
+
+def test_breaker_opens_after_threshold_and_probes_once():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    breaker.reset_timeout = 0
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_get_is_retried_after_read_timeout():
+    client = _client(requests.ReadTimeout(), 503, 200)
+    assert client.get("/v1/search").status_code == 200
+    assert client.session.calls == 3
+
+
+def test_post_is_not_retried_after_read_timeout():
+    client = _client(requests.ReadTimeout(), 200)
+    with pytest.raises(requests.ReadTimeout):
+        client.post("/v1/generation")
+    assert client.session.calls == 1
+
+
+def test_post_is_retried_when_it_never_connected():
+    client = _client(requests.ConnectTimeout(), 429, 200)
+    assert client.post("/v1/generation").status_code == 200
+    assert client.session.calls == 3
+
+
+@pytest.mark.parametrize("error", [requests.TooManyRedirects(), requests.exceptions.InvalidURL(), ValueError("bad")])
+def test_unexpected_error_resolves_the_probe(error):
+    breaker = _open_breaker()
+    client = _client(error, 200, breaker=breaker)
+    with pytest.raises(type(error)):
+        client.get("/v1/search")
+    assert client.session.calls == 1
+    # The failed probe re-opened the circuit; once it is half-open again a new probe gets through.
+    assert client.get("/v1/search").status_code == 200
+    assert breaker.state == "closed"
+
+
+def test_interrupted_probe_lets_the_next_call_probe():
+    breaker = _open_breaker()
+    client = _client(KeyboardInterrupt(), 200, breaker=breaker)
+    with pytest.raises(KeyboardInterrupt):
+        client.get("/v1/search")
+    assert client.get("/v1/search").status_code == 200
+
+
+def test_open_circuit_fails_fast():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    client = _client(requests.ConnectionError(), breaker=breaker, retries=0)
+    with pytest.raises(requests.ConnectionError):
+        client.get("/v1/search")
+    with pytest.raises(CircuitOpenError):
+        client.get("/v1/search")
+
+
+def _async_client(handler, breaker=None):
+    client = _client(breaker=breaker).async_twin()
+    client.client = httpx.AsyncClient(base_url="http://upstream.invalid", transport=httpx.MockTransport(handler))
+    return client
+
+
+def test_async_post_is_not_retried_after_read_timeout():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        raise httpx.ReadTimeout("slow", request=request)
+
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(_async_client(handler).post("/v1/generation"))
+    assert len(calls) == 1
+
+
+def test_async_decoding_error_resolves_the_probe():
+    breaker = _open_breaker()
+    outcomes = [httpx.DecodingError("bad gzip"), None]
+
+    def handler(request):
+        outcome = outcomes.pop(0)
+        if outcome:
+            raise outcome
+        return httpx.Response(200)
+
+    client = _async_client(handler, breaker)
+    with pytest.raises(httpx.DecodingError):
+        asyncio.run(client.get("/v1/search"))
+    assert asyncio.run(client.get("/v1/search")).status_code == 200
+    assert breaker.state == "closed"
+
+
+@pytest.mark.parametrize("status", [500, 502, 504])
+def test_post_is_sent_once_when_the_upstream_may_have_acted(status):
+    client = _client(status, 200)
+    assert client.post("/v1/generation").status_code == status
+    assert client.session.calls == 1
+
+
+def test_post_is_retried_when_refused():
+    client = _client(429, 503, 200)
+    assert client.post("/v1/generation").status_code == 200
+    assert client.session.calls == 3
+
+
+def test_async_post_is_sent_once_on_500():
+    statuses = [500, 200]
+
+    def handler(request):
+        return httpx.Response(statuses.pop(0))
+
+    assert asyncio.run(_async_client(handler).post("/v1/generation")).status_code == 500
+    assert statuses == [200]
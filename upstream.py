@@ -0,0 +1,229 @@
+import asyncio
+import random
+import threading
+import time
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+import metrics
+
+# Statuses worth retrying: throttling and transient server-side failures.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# The subset that says the upstream turned the request away without acting on
+# it, so even a non-idempotent request may be sent again (after Retry-After).
+REJECTED_STATUSES = {429, 503}
+# Methods that are safe to send twice. Anything else (the billed Stability
+# POST) is retried only when the request provably never reached the upstream:
+# it failed to connect, or came back 429/503.
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+# Transport failures worth another attempt; any other exception fails the call at once.
+RETRY_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Stops calling an upstream after repeated failures, then probes it again.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls
+    fail fast for `reset_timeout` seconds. The first call after that is let
+    through as a probe: success closes the circuit, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures, self.opened_at, self._probing = 0, None, False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self.opened_at, self._probing = time.monotonic(), False
+
+    def release(self):
+        """Ends a call that was interrupted (cancelled, not failed), so the next call can probe."""
+        with self._lock:
+            self._probing = False
+
+
+class UpstreamClient:
+    """HTTP client for one upstream API: pooled keep-alive connections, timeouts,
+    bounded retries with jittered exponential backoff, and a circuit breaker.
+
+    Returns the final `requests.Response` (callers still `raise_for_status()`);
+    raises the last transport error if every attempt failed to connect, or
+    CircuitOpenError if the breaker is open. Non-idempotent requests are
+    retried only if they never connected or were refused with 429/503.
+    """
+
+    def __init__(self, name, base_url, headers=None, connect_timeout=5, read_timeout=30,
+                 retries=2, backoff=0.5, max_backoff=8, pool_size=20, breaker=None):
+        self.name = name
+        # Every attempt, retries included, is timed under this stage name.
+        self.stage = f"upstream_{name.lower().replace(' ', '_')}"
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.headers = headers or {}
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        # Retries are handled here, so urllib3's own retry logic is disabled.
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def async_twin(self, max_connections=200):
+        """Returns an AsyncUpstreamClient with the same settings, sharing this circuit breaker."""
+        return AsyncUpstreamClient(
+            self.name, self.base_url, self.headers, self.timeout, self.retries,
+            self.backoff, self.max_backoff, max_connections, self.breaker,
+        )
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def request(self, method, path, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"{self.name} is unavailable; not retrying for now.")
+            last_attempt = attempt == self.retries
+            # Every exit from the attempt settles the breaker, so a half-open probe is never left hanging.
+            try:
+                with metrics.stage(self.stage):
+                    response = self.session.request(method, f"{self.base_url}{path}", **kwargs)
+            except RETRY_ERRORS as e:
+                self.breaker.record_failure()
+                if last_attempt or not (idempotent or _never_sent(e)):
+                    raise
+                self._sleep(attempt)
+                continue
+            except Exception:
+                self.breaker.record_failure()
+                raise
+            except BaseException:
+                self.breaker.release()
+                raise
+            if response.status_code not in RETRY_STATUSES:
+                self.breaker.record_success()
+                return response
+            self.breaker.record_failure()
+            if last_attempt or not (idempotent or response.status_code in REJECTED_STATUSES):
+                return response
+            self._sleep(attempt, response.headers.get("Retry-After"))
+
+    def _sleep(self, attempt, retry_after=None):
+        time.sleep(_backoff_delay(attempt, self.backoff, self.max_backoff, retry_after))
+
+
+class AsyncUpstreamClient:
+    """asyncio counterpart of UpstreamClient built on httpx, used by the ASGI entry point.
+
+    Same retry, backoff and circuit-breaker behaviour; create it with
+    `UpstreamClient.async_twin()` and close it with `aclose()`.
+    """
+
+    def __init__(self, name, base_url, headers, timeout, retries, backoff, max_backoff, max_connections, breaker):
+        self.name = name
+        self.stage = f"upstream_{name.lower().replace(' ', '_')}"
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker
+        connect_timeout, read_timeout = timeout
+        self.client = httpx.AsyncClient(
+            base_url=base_url, headers=headers,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    async def get(self, path, **kwargs):
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request("POST", path, **kwargs)
+
+    async def request(self, method, path, **kwargs):
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"{self.name} is unavailable; not retrying for now.")
+            last_attempt = attempt == self.retries
+            try:
+                with metrics.stage(self.stage):
+                    response = await self.client.request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                self.breaker.record_failure()
+                if last_attempt or not (idempotent or isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))):
+                    raise
+                await asyncio.sleep(_backoff_delay(attempt, self.backoff, self.max_backoff))
+                continue
+            except Exception:
+                self.breaker.record_failure()
+                raise
+            except BaseException:
+                # Cancelled with the request that awaited it; that says nothing about the upstream.
+                self.breaker.release()
+                raise
+            if response.status_code not in RETRY_STATUSES:
+                self.breaker.record_success()
+                return response
+            self.breaker.record_failure()
+            if last_attempt or not (idempotent or response.status_code in REJECTED_STATUSES):
+                return response
+            await asyncio.sleep(_backoff_delay(attempt, self.backoff, self.max_backoff, response.headers.get("Retry-After")))
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+def _never_sent(error):
+    """True if `error` means the request could not even connect, so the upstream never saw it."""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def _backoff_delay(attempt, backoff, max_backoff, retry_after=None):
+    # "Full jitter": a random delay up to the exponential bound spreads retries out.
+    delay = random.uniform(0, min(max_backoff, backoff * 2 ** attempt))
+    if retry_after and retry_after.isdigit():
+        delay = max(delay, min(float(retry_after), max_backoff))
+    return delay